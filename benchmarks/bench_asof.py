@@ -0,0 +1,71 @@
+"""
+Point-in-time values across a universe: a get_financial_data loop per ticker
+vs FinancialDatabase.get_financial_asof vs FinancialAsOf.at over many dates
+
+    python -m benchmarks.bench_asof --tickers 1000 --dates 250
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_financial_upsert import make_statements
+from market.panel import FinancialAsOf
+from market.sql import FinancialDatabase
+
+STATEMENT_TYPE = 'Income Statement'
+
+
+def loop_asof(fd, tickers, as_of):
+    """the per-ticker loop: fetch each statement, forward-fill to as_of"""
+    latest = {}
+    for ticker in tickers:
+        df = fd.get_financial_data(ticker, STATEMENT_TYPE, end_date=as_of)
+        if not df.empty:
+            latest[ticker] = df.T.ffill().iloc[-1]
+    return pd.DataFrame(latest).T
+
+
+def run(label, fn, repeat=1):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<24} {elapsed * 1000:10.1f} ms' + (f'  {elapsed / repeat * 1000:8.2f} ms/date' if repeat > 1 else ''))
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=1000)
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--periods', type=int, default=20)
+    parser.add_argument('--dates', type=int, default=250)
+    parser.add_argument('--compact', action='store_true', help='use the compact layout')
+    args = parser.parse_args()
+
+    statements = make_statements(args.tickers, args.metrics, args.periods)
+    tickers = list(statements)
+    dates = pd.date_range('2020-01-01', '2024-12-31', periods=args.dates).to_numpy(dtype='datetime64[D]')
+    as_of = str(dates[len(dates) // 2])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fd = FinancialDatabase(os.path.join(tmp, 'asof.db'), compact=args.compact)
+        fd.bulk_update_financial_data(statements)
+
+        loop, expected = run('ticker loop, 1 date', lambda: loop_asof(fd, tickers, as_of))
+        one, frame = run('get_financial_asof', lambda: fd.get_financial_asof(
+            as_of, statement_types=[STATEMENT_TYPE]))
+        assert np.allclose(frame.loc[expected.index, expected.columns].to_numpy(), expected.to_numpy(dtype='f8'),
+                           equal_nan=True)
+        load, asof = run('FinancialAsOf.load', lambda: FinancialAsOf.load(fd, None, None, [STATEMENT_TYPE]))
+        many, _ = run(f'at({args.dates} dates)', lambda: asof.at(dates), args.dates)
+        print(f'speedup                  1 date {loop / one:.0f}x, '
+              f'{args.dates} dates {loop * args.dates / (load + many):.0f}x (loop estimated)')
+        fd.close()
+
+
+if __name__ == '__main__':
+    main()
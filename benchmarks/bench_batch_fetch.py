@@ -0,0 +1,64 @@
+"""
+Sequential vs batched MarketData fetches against the offline LocalProvider
+with simulated latency and transient failures
+
+    python -m benchmarks.bench_batch_fetch --tickers 200 --latency 0.05
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from market.data import MarketData
+from market.provider import LocalProvider
+
+
+class FlakyProvider(LocalProvider):
+    """Synthetic provider whose statement calls fail at a given rate"""
+    def __init__(self, latency, failure_rate):
+        super().__init__(synthetic=True, latency=latency)
+        self.failure_rate = failure_rate
+
+    def get_statement(self, ticker, attribute):
+        if random.random() < self.failure_rate:
+            raise ConnectionError(f'simulated upstream failure for {ticker}')
+        return super().get_statement(ticker, attribute)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=None, help='upstream requests per second')
+    args = parser.parse_args()
+
+    tickers = [f'T{i:04d}' for i in range(args.tickers)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        md = MarketData(os.path.join(tmp, 'seq.db'), provider=LocalProvider(latency=args.latency))
+        start = time.perf_counter()
+        for ticker in tickers:
+            md.get_detailed_financials(ticker)
+        sequential = time.perf_counter() - start
+        md.close()
+        print(f'sequential {sequential:8.3f}s')
+
+        md = MarketData(os.path.join(tmp, 'batch.db'), provider=FlakyProvider(args.latency, 0.05),
+                        rate_limit=args.rate, max_workers=args.workers)
+        md.batch.backoff = args.latency
+        start = time.perf_counter()
+        results = list(md.batch_detailed_financials(tickers))
+        batched = time.perf_counter() - start
+        md.close()
+
+        failed = sum(result.error is not None for result in results)
+        retried = sum(result.attempts > 1 for result in results)
+        print(f'batched    {batched:8.3f}s  {len(results)} results, '
+              f'{retried} retried, {failed} failed')
+        print(f'speedup    {sequential / batched:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Loading a long-form CSV dump: read_csv + pivot into statements +
+bulk_update_financial_data vs market.bulk_load, in-process and with workers
+
+    python -m benchmarks.bench_bulk_load --tickers 500 --workers 4
+
+--quarterly names the statements 'Quarterly ...', so the loads also
+maintain derived_metrics.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_financial_upsert import make_statements
+from market.bulk_load import CHUNK_BYTES, bulk_load
+from market.sql import DERIVED_STATEMENT_PREFIX, FinancialDatabase
+
+
+def write_dump(path, statements):
+    """statements as one shuffled CSV row per value"""
+    frames = []
+    for ticker, ticker_statements in statements.items():
+        for statement_type, df in ticker_statements.items():
+            long = df.rename_axis(index='metric_name', columns='date').stack().rename('value').reset_index()
+            frames.append(long.assign(ticker=ticker, statement_type=statement_type))
+    dump = pd.concat(frames).sample(frac=1, random_state=0)
+    dump['date'] = dump['date'].dt.strftime('%Y-%m-%d')
+    dump[['ticker', 'statement_type', 'metric_name', 'date', 'value']].to_csv(path, index=False)
+    return len(dump)
+
+
+def pivot_update(db, path):
+    """what loading a dump takes through the per-statement API"""
+    dump = pd.read_csv(path)
+    statements = {}
+    for (ticker, statement_type), rows in dump.groupby(['ticker', 'statement_type']):
+        statements.setdefault(ticker, {})[statement_type] = rows.pivot(
+            index='metric_name', columns='date', values='value')
+    db.bulk_update_financial_data(statements)
+
+
+def run(label, fn, n_rows):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<12} {elapsed:8.3f}s {n_rows / elapsed:14,.0f} rows/s')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--dates', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-mb', type=float, default=CHUNK_BYTES / 2 ** 20)
+    parser.add_argument('--quarterly', action='store_true', help='quarterly statements, with derived metrics')
+    args = parser.parse_args()
+    chunk_bytes = int(args.chunk_mb * 2 ** 20)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dump.csv')
+        statements = make_statements(args.tickers, args.metrics, args.dates)
+        if args.quarterly:
+            statements = {ticker: {DERIVED_STATEMENT_PREFIX + statement_type: df
+                                   for statement_type, df in ticker_statements.items()}
+                          for ticker, ticker_statements in statements.items()}
+        n_rows = write_dump(path, statements)
+        print(f'{n_rows:,} rows, {os.path.getsize(path) / 1e6:.1f} MB')
+
+        databases = [FinancialDatabase(os.path.join(tmp, f'{name}.db')) for name in ('pivot', 'bulk', 'workers')]
+        pivot = run('pivot', lambda: pivot_update(databases[0], path), n_rows)
+        bulk = run('bulk_load', lambda: bulk_load(databases[1], [path], chunk_bytes=chunk_bytes), n_rows)
+        workers = run(f'{args.workers} workers', lambda: bulk_load(
+            databases[2], [path], workers=args.workers, chunk_bytes=chunk_bytes), n_rows)
+        print(f'speedup      {pivot / bulk:8.1f}x in-process, {pivot / workers:.1f}x with workers')
+        for db in databases:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Candlestick chart generation from a full series vs the downsampling pyramid
+
+Builds a synthetic minute series (390 bars a day, 252 days a year), then
+times full-resolution and pyramid-window figures and their JSON payloads.
+A second pass times building and reopening the pyramid of a ticker in a
+PriceHistoryStore.
+
+    python -m benchmarks.bench_chart_pyramid --years 20 --width 1200
+    python -m benchmarks.bench_chart_pyramid --years 20 --skip-full   # full figure is slow
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from market.data import MarketData
+from market.provider import LocalProvider
+from market.pyramid import OHLCPyramid
+
+
+def minute_series(years, seed=0):
+    rng = np.random.default_rng(seed)
+    days = np.busday_offset('2000-01-03', np.arange(252 * years), roll='forward')
+    dates = (days.astype('datetime64[m]')[:, None] + np.timedelta64(570, 'm')
+             + np.arange(390).astype('timedelta64[m]')).ravel()
+    n = len(dates)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0003, n)) * close
+    return {
+        'Date': dates,
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 10_000, n),
+    }
+
+
+def timed(fn, runs=5):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--width', type=int, default=1200, help='chart width in pixels')
+    parser.add_argument('--skip-full', action='store_true', help='skip the full-resolution figure')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        md = MarketData(os.path.join(tmp, 'chart.db'), provider=LocalProvider(),
+                        history_root=os.path.join(tmp, 'history'))
+
+        data = minute_series(args.years)
+        n = len(data['Date'])
+        print(f'{n:,} minute bars')
+
+        if not args.skip_full:
+            seconds, fig = timed(lambda: md.create_candlestick_chart(data), runs=1)
+            print(f'full figure        {seconds * 1000:10.1f} ms  {len(fig.to_json()) / 1e6:8.1f} MB')
+
+        seconds, pyramid = timed(lambda: OHLCPyramid.build('MIN', data), runs=1)
+        print(f'pyramid build      {seconds * 1000:10.1f} ms  {len(pyramid.levels)} levels')
+
+        last = data['Date'][-1]
+        windows = {
+            'all': (None, None),
+            'last year': (last - np.timedelta64(365, 'D'), None),
+            'last week': (last - np.timedelta64(7, 'D'), None),
+        }
+        for name, (start, end) in windows.items():
+            seconds, view = timed(lambda: pyramid.window(start, end, args.width))
+            query = seconds
+            seconds, fig = timed(lambda: md.create_candlestick_chart(view))
+            print(f'{name:<10} query {query * 1e6:8.1f} us  figure {seconds * 1000:6.1f} ms  '
+                  f'{len(view):5d} bars  {len(fig.to_json()) / 1e3:8.1f} KB')
+
+        # daily history through the store: first call builds and saves, later ones map
+        md.get_stock_data('AAPL', '1970-01-01', '2030-01-01')
+        seconds, _ = timed(lambda: OHLCPyramid.load(md.history, 'AAPL'), runs=1)
+        print(f'store build        {seconds * 1000:10.1f} ms  {len(md.history.view("AAPL")):,} daily bars')
+        seconds, _ = timed(lambda: OHLCPyramid.load(md.history, 'AAPL'))
+        print(f'store reopen       {seconds * 1000:10.1f} ms')
+        seconds, _ = timed(lambda: md.get_chart_data('AAPL', '2020-01-01', '2021-01-01', args.width))
+        print(f'cached window      {seconds * 1e6:10.1f} us')
+        md.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold-start cost of the engine: import time per module and time to first frame
+
+Each measurement runs in a fresh interpreter. Import times come from
+`python -X importtime`; time to first frame is taken from process launch
+until GraphicsEngine has rendered and flushed one frame.
+
+    python -m benchmarks.bench_cold_start --runs 5
+    SDL_VIDEODRIVER=offscreen python -m benchmarks.bench_cold_start   # headless
+    python -m benchmarks.bench_cold_start --max-import-ms 500        # fail on regression
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_FRAME = '''
+import main
+app = main.GraphicsEngine()
+app.get_time()
+app.render()
+app.ctx.finish()
+print('FIRST_FRAME', flush=True)
+import os
+os._exit(0)
+'''
+
+
+def import_times(module):
+    """{module: cumulative microseconds} for one cold `import module`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        # a module is reported once, at the depth it was first imported from
+        times.setdefault(name, int(cumulative))
+    return times
+
+
+def time_to_first_frame():
+    """Seconds from launching the interpreter to the first rendered frame"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', FIRST_FRAME], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if line.startswith('FIRST_FRAME'):
+            elapsed = time.perf_counter() - start
+            break
+    else:
+        elapsed = None
+    process.kill()
+    process.wait()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list')
+    parser.add_argument('--no-frame', action='store_true', help='skip the time-to-first-frame run')
+    parser.add_argument('--max-import-ms', type=float, default=None,
+                        help='exit non-zero when `import main` is slower than this')
+    args = parser.parse_args()
+
+    runs = [import_times('main') for _ in range(args.runs)]
+    median = {name: statistics.median(run.get(name, 0) for run in runs) for name in runs[0]}
+    total_ms = median['main'] / 1000
+
+    print(f'import main: {total_ms:8.1f} ms (median of {args.runs})')
+    for name in ('core', 'market', 'market.data', 'pygame', 'moderngl', 'numpy',
+                 'pandas', 'yfinance', 'plotly', 'pywavefront', 'memory_profiler'):
+        status = f'{median[name] / 1000:8.1f} ms' if name in median else '    lazy'
+        print(f'  {name:<18}{status}')
+    print(f'slowest {args.top} modules (cumulative):')
+    for name, us in sorted(median.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f'  {name:<40}{us / 1000:8.1f} ms')
+
+    if not args.no_frame:
+        frames = [time_to_first_frame() for _ in range(args.runs)]
+        if None in frames:
+            print('first frame: not reached (no display? try SDL_VIDEODRIVER=offscreen)')
+        else:
+            print(f'first frame: {statistics.median(frames) * 1000:8.1f} ms')
+
+    if args.max_import_ms is not None and total_ms > args.max_import_ms:
+        print(f'FAIL: import main took {total_ms:.1f} ms > {args.max_import_ms} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
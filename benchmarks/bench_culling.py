@@ -0,0 +1,71 @@
+"""
+Frame time with and without frustum culling, camera standing in a cube field
+and looking across it, plus the cost of the cull itself
+
+    python -m benchmarks.bench_culling --counts 10000 100000 --backend egl
+"""
+import argparse
+import time
+
+import glm
+import moderngl as mgl
+import numpy as np
+import pygame as pg
+
+from benchmarks.bench_instancing import WIN_SIZE, BenchApp, frame_times
+from core import SceneRenderer
+
+
+def no_cull(renderer):
+    """pack every instance for both passes, as before culling"""
+    def cull(m_proj_view, m_shadow_proj_view):
+        for group in renderer.groups:
+            everything = np.ones(len(group.objects), dtype=bool)
+            group.cull(everything, everything)
+    return cull
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--counts', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--backend', default=None, help='moderngl standalone backend, e.g. egl')
+    args = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode((1, 1))
+    ctx = mgl.create_standalone_context(**({'backend': args.backend} if args.backend else {}))
+    fbo = ctx.simple_framebuffer(WIN_SIZE)
+    mesh = BenchApp(ctx, 0).mesh
+    print(f'{ctx.info["GL_RENDERER"]}')
+    print(f'{"cubes":>8} {"visible":>8} {"shadow":>8} {"cull":>8} {"all drawn":>10} {"culled":>10} {"speedup":>8}')
+
+    for n in args.counts:
+        app = BenchApp(ctx, n, mesh)
+        camera = app.camera
+        camera.position, camera.yaw, camera.pitch = glm.vec3(0, 4, 0), -60, -10
+        camera.update_camera_vectors()
+        camera.m_view = camera.get_view_matrix()
+        renderer = SceneRenderer(app)
+        renderer.framebuffer = fbo
+        renderer.group_objects()
+
+        culled = frame_times(renderer, fbo, args.frames)
+        culler = renderer.culler
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            culler.cull(camera.m_proj * camera.m_view, camera.m_proj * app.light.m_view_light)
+        cull = (time.perf_counter() - start) / args.frames
+        visible, shadow_visible = culler.visible, culler.shadow_visible
+
+        culler.cull = no_cull(renderer)
+        everything = frame_times(renderer, fbo, args.frames)
+        print(f'{n:8,} {visible:8,} {shadow_visible:8,} {cull * 1000:6.2f}ms '
+              f'{everything[1] * 1000:8.1f}ms {culled[1] * 1000:8.1f}ms {everything[1] / culled[1]:7.1f}x')
+        renderer.destroy()
+    print('ms per frame until the GPU finishes')
+    mesh.destroy()
+
+
+if __name__ == '__main__':
+    main()
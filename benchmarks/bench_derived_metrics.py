@@ -0,0 +1,89 @@
+"""
+Incremental QoQ / YoY maintenance in bulk_update_financial_data vs
+rebuild_derived_metrics, checking that both leave the same derived_metrics
+after a new quarter is appended and after a missing one is backfilled
+
+    python -m benchmarks.bench_derived_metrics --tickers 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from market.sql import FinancialDatabase
+
+STATEMENT_TYPE = 'Quarterly Income Statement'
+
+
+def make_quarters(n_tickers, n_metrics, n_dates, seed=0):
+    """{ticker: metrics x quarter-end frame}, latest quarter first like yfinance"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end='2024-12-31', periods=n_dates, freq='QE')[::-1]
+    metrics = [f'Metric {i}' for i in range(n_metrics)]
+    return {f'T{t:04d}': pd.DataFrame(rng.normal(1e9, 1e8, (n_metrics, n_dates)), index=metrics, columns=dates)
+            for t in range(n_tickers)}
+
+
+def derived_table(fd):
+    with fd.connect() as conn:
+        return pd.read_sql_query('SELECT * FROM derived_metrics ORDER BY ticker, statement_type, metric_name, date',
+                                 conn)
+
+
+def check(fd, label):
+    """incremental derived_metrics must equal a rebuild from the stored values"""
+    incremental = derived_table(fd)
+    fd.rebuild_derived_metrics()
+    rebuilt = derived_table(fd)
+    pd.testing.assert_frame_equal(incremental, rebuilt)
+    print(f'{label:<12} {len(incremental):,} derived rows match rebuild_derived_metrics')
+
+
+def run(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f'{label:<12} {time.perf_counter() - start:8.3f}s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--metrics', type=int, default=40)
+    parser.add_argument('--dates', type=int, default=12)
+    args = parser.parse_args()
+
+    quarters = make_quarters(args.tickers, args.metrics, args.dates)
+    # hold back the latest quarter and one in the middle of the history
+    latest, missing = 0, args.dates // 2
+    with tempfile.TemporaryDirectory() as tmp:
+        fd = FinancialDatabase(os.path.join(tmp, 'derived.db'))
+        run('initial', lambda: fd.bulk_update_financial_data({
+            ticker: {STATEMENT_TYPE: df.drop(columns=df.columns[[latest, missing]])}
+            for ticker, df in quarters.items()}))
+        check(fd, 'initial')
+
+        run('append', lambda: fd.bulk_update_financial_data({
+            ticker: {STATEMENT_TYPE: df.drop(columns=df.columns[missing])} for ticker, df in quarters.items()}))
+        check(fd, 'append')
+
+        # the missing quarter shifts every later one: their YoY bases change
+        run('backfill', lambda: fd.bulk_update_financial_data({
+            ticker: {STATEMENT_TYPE: df} for ticker, df in quarters.items()}))
+        check(fd, 'backfill')
+
+        for df in quarters.values():
+            df.iloc[:, missing] *= 1.1
+        run('edit', lambda: fd.bulk_update_financial_data({
+            ticker: {STATEMENT_TYPE: df} for ticker, df in quarters.items()}))
+        check(fd, 'edit')
+
+        run('rebuild', fd.rebuild_derived_metrics)
+        fd.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Reading statements back: read_sql_query + pivot per statement vs the
+array-native FinancialDatabase query paths
+
+    python -m benchmarks.bench_financial_query --tickers 300
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_financial_upsert import STATEMENT_TYPES, make_statements
+from market.sql import FinancialDatabase
+
+
+def legacy_query(conn, ticker_symbol, statement_type):
+    """the original read_sql_query + pivot"""
+    df = pd.read_sql_query('''
+        SELECT metric_name, date, value
+        FROM financial_data
+        WHERE ticker = ? AND statement_type = ?
+    ''', conn, params=[ticker_symbol, statement_type])
+    return df.pivot(index='metric_name', columns='date', values='value')
+
+
+def run(label, fn, n_calls):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<14} {elapsed * 1000:9.1f} ms {elapsed / n_calls * 1e6:9.1f} us/statement')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=300)
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--dates', type=int, default=4)
+    args = parser.parse_args()
+
+    statements = make_statements(args.tickers, args.metrics, args.dates)
+    tickers = list(statements)
+    n_calls = len(tickers) * len(STATEMENT_TYPES)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fd = FinancialDatabase(os.path.join(tmp, 'query.db'))
+        fd.bulk_update_financial_data(statements)
+        conn = fd.connect()
+
+        legacy = run('pivot', lambda: [legacy_query(conn, ticker, statement_type)
+                                       for ticker in tickers for statement_type in STATEMENT_TYPES], n_calls)
+        frames = run('frame', lambda: [fd.get_financial_data(ticker, statement_type)
+                                       for ticker in tickers for statement_type in STATEMENT_TYPES], n_calls)
+        arrays = run('arrays', lambda: fd.get_financial_arrays(tickers, STATEMENT_TYPES), n_calls)
+        cached = run('arrays cached', lambda: fd.get_financial_arrays(tickers, STATEMENT_TYPES), n_calls)
+        print(f'speedup        frame {legacy / frames:.1f}x  arrays {legacy / arrays:.1f}x  '
+              f'cached {legacy / cached:.0f}x')
+        fd.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+File size and query latency of the TEXT-keyed financial_data table vs the
+compact dictionary-encoded layout, plus the time to migrate between them
+
+    python -m benchmarks.bench_financial_schema --tickers 500
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_financial_upsert import STATEMENT_TYPES, make_statements
+from market.sql import FinancialDatabase
+
+
+def timed(fn, runs=3):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def file_size(path):
+    """Bytes on disk, counting the WAL until it is checkpointed"""
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--dates', type=int, default=8)
+    args = parser.parse_args()
+
+    statements = make_statements(args.tickers, args.metrics, args.dates)
+    tickers = list(statements)
+    n_rows = args.tickers * len(STATEMENT_TYPES) * args.metrics * args.dates
+    print(f'{args.tickers} tickers, {n_rows:,} cells')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'text': os.path.join(tmp, 'text.db'), 'compact': os.path.join(tmp, 'compact.db')}
+        databases = {}
+        for layout, path in paths.items():
+            fd = FinancialDatabase(path, compact=layout == 'compact')
+            seconds = timed(lambda: fd.bulk_update_financial_data(statements), runs=1)
+            fd.connect().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            print(f'{layout:<8} load {seconds:7.2f}s  size {file_size(path) / 1e6:8.1f} MB')
+            databases[layout] = fd
+
+        migrated = os.path.join(tmp, 'migrated.db')
+        databases['text'].connect().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        shutil.copy(paths['text'], migrated)
+        start = time.perf_counter()
+        FinancialDatabase(migrated, compact=True).close()
+        print(f'migrate       {time.perf_counter() - start:7.2f}s  size {file_size(migrated) / 1e6:8.1f} MB')
+
+        sample = tickers[::max(1, len(tickers) // 50)]
+        queries = {
+            'statement': lambda fd: [fd.get_financial_data(ticker, statement_type)
+                                     for ticker in sample for statement_type in STATEMENT_TYPES],
+            'date range': lambda fd: [fd.get_financial_data(ticker, statement_type, '2023-01-01', '2024-12-31')
+                                      for ticker in sample for statement_type in STATEMENT_TYPES],
+            'arrays': lambda fd: (fd.array_cache.invalidate(), fd.get_financial_arrays(tickers, STATEMENT_TYPES)),
+            'rows': lambda fd: fd.get_financial_rows(tickers, STATEMENT_TYPES, ['Metric 0', 'Metric 1']),
+        }
+        print(f'{"query":<12}{"text":>12}{"compact":>12}')
+        for name, query in queries.items():
+            text, compact = (timed(lambda: query(databases[layout])) for layout in ('text', 'compact'))
+            print(f'{name:<12}{text * 1000:9.1f} ms{compact * 1000:9.1f} ms  {text / compact:5.1f}x')
+
+        for fd in databases.values():
+            fd.close()
+
+
+if __name__ == '__main__':
+    main()
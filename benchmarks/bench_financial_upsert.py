@@ -0,0 +1,96 @@
+"""
+Throughput of FinancialDatabase bulk upserts against the per-cell loop
+
+    python -m benchmarks.bench_financial_upsert --tickers 200
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from market.sql import FinancialDatabase
+
+STATEMENT_TYPES = ('Balance Sheet', 'Income Statement', 'Cash Flow')
+
+
+def make_statements(n_tickers, n_metrics, n_dates, seed=0):
+    """synthetic yfinance-shaped statements: metrics x descending dates"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end='2024-12-31', periods=n_dates, freq='QE')[::-1]
+    metrics = [f'Metric {i}' for i in range(n_metrics)]
+    statements = {}
+    for t in range(n_tickers):
+        statements[f'T{t:04d}'] = {
+            statement_type: pd.DataFrame(
+                rng.normal(1e9, 1e8, (n_metrics, n_dates)), index=metrics, columns=dates)
+            for statement_type in STATEMENT_TYPES
+        }
+    return statements
+
+
+def legacy_update(db_path, ticker_symbol, statements):
+    """the original one-execute-per-cell loop"""
+    current_time = datetime.now().isoformat(' ')
+    with sqlite3.connect(db_path) as conn:
+        for statement_type, df in statements.items():
+            df = df.copy()
+            df.columns = df.columns.strftime('%Y-%m-%d')
+            for metric_name in df.index:
+                for date, value in df.loc[metric_name].items():
+                    if isinstance(value, (np.integer, np.floating)):
+                        value = float(value)
+                    conn.execute('''
+                        INSERT OR REPLACE INTO financial_data
+                        (ticker, statement_type, metric_name, date, value, last_updated)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (ticker_symbol, statement_type, metric_name, date, value, current_time))
+        conn.execute('''
+            INSERT OR REPLACE INTO update_log (ticker, last_updated)
+            VALUES (?, ?)
+        ''', (ticker_symbol, current_time))
+
+
+def run(label, fn, n_rows):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<10} {elapsed:8.3f}s {n_rows / elapsed:14,.0f} rows/s')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--dates', type=int, default=4)
+    args = parser.parse_args()
+
+    statements = make_statements(args.tickers, args.metrics, args.dates)
+    n_rows = args.tickers * len(STATEMENT_TYPES) * args.metrics * args.dates
+    print(f'{args.tickers} tickers, {n_rows:,} cells')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = FinancialDatabase(os.path.join(tmp, 'legacy.db'))
+        bulk_db = FinancialDatabase(os.path.join(tmp, 'bulk.db'))
+
+        legacy = run('loop', lambda: [legacy_update(legacy_db.db_path, ticker, s)
+                                      for ticker, s in statements.items()], n_rows)
+        bulk = run('bulk', lambda: bulk_db.bulk_update_financial_data(statements), n_rows)
+        print(f'speedup    {legacy / bulk:8.1f}x')
+
+        # daily refresh: nothing changed, then one new value per statement
+        run('unchanged', lambda: bulk_db.bulk_update_financial_data(statements), n_rows)
+        for ticker_statements in statements.values():
+            for df in ticker_statements.values():
+                df.iloc[0, 0] += 1.0
+        written = bulk_db.bulk_update_financial_data(statements)
+        print(f'delta      {written:,} of {n_rows:,} cells rewritten')
+
+
+if __name__ == '__main__':
+    main()
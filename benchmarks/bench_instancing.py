@@ -0,0 +1,114 @@
+"""
+Scene frame time with one draw call per object vs one instanced draw per
+(vao_name, texture) group, shadow and main pass, from 1k to 100k cubes
+
+    python -m benchmarks.bench_instancing --counts 1000 10000 100000
+
+Renders offscreen through a standalone context (--backend egl when there
+is no display).
+"""
+import argparse
+import math
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import moderngl as mgl
+import pygame as pg
+
+from core import Camera, Cube, Light, Mesh, MovingCube, Scene, SceneRenderer
+from core.instancing import InstanceGroup
+
+WIN_SIZE = (1280, 720)
+
+
+class CubeField(Scene):
+    """n cubes on a square grid in three textures, plus the moving cube"""
+    def __init__(self, app, n):
+        self.n = n
+        super().__init__(app)
+
+    def load(self):
+        side = math.ceil(math.sqrt(self.n))
+        for i in range(self.n):
+            x, z = divmod(i, side)
+            self.add_object(Cube(self.app, pos=(2 * x - side, -2, 2 * z - side), tex_id=i % 3))
+        self.moving_cube = MovingCube(self.app, pos=(0, 6, 8), scale=(3, 3, 3), tex_id=1)
+        self.add_object(self.moving_cube)
+
+
+class BenchApp:
+    def __init__(self, ctx, n, mesh=None):
+        self.WIN_SIZE = WIN_SIZE
+        self.ctx = ctx
+        self.time = 0.0
+        self.delta_time = 16
+        self.light = Light()
+        self.camera = Camera(self, position=(0, 60, 90), pitch=-35)
+        self.camera.update_camera_vectors()
+        self.camera.m_view = self.camera.get_view_matrix()
+        # textures and VBOs only need the context, so apps can share a mesh
+        self.mesh = mesh or Mesh(self)
+        self.scene = CubeField(self, n)
+
+
+def frame_times(renderer, fbo, frames):
+    """(seconds to submit, seconds until the GPU is done) per frame"""
+    ctx = renderer.ctx
+    submit = total = 0.0
+    for i in range(frames + 1):
+        renderer.app.time = i * 0.016
+        start = time.perf_counter()
+        fbo.use()
+        fbo.clear(0.08, 0.16, 0.18)
+        renderer.render()
+        submitted = time.perf_counter()
+        ctx.finish()
+        # the first frame also builds the groups
+        if i:
+            submit += submitted - start
+            total += time.perf_counter() - start
+    return submit / frames, total / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--backend', default=None, help='moderngl standalone backend, e.g. egl')
+    args = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode((1, 1))
+    ctx = mgl.create_standalone_context(**({'backend': args.backend} if args.backend else {}))
+    fbo = ctx.simple_framebuffer(WIN_SIZE)
+    mesh = BenchApp(ctx, 0).mesh
+    print(f'{ctx.info["GL_RENDERER"]}')
+    print(f'{"cubes":>8} {"draws/pass":>11} {"per object":>22} {"instanced":>22} {"speedup":>8}')
+
+    for n in args.counts:
+        app = BenchApp(ctx, n, mesh)
+        renderer = SceneRenderer(app)
+        renderer.framebuffer = fbo
+
+        renderer.group_objects()
+        instanced = frame_times(renderer, fbo, args.frames)
+        n_groups = len(renderer.groups)
+
+        # the old path: a draw (and a matrix upload) per object
+        renderer.release_groups()
+        renderer.set_groups([InstanceGroup(mesh, [obj]) for obj in app.scene.objects])
+        per_object = frame_times(renderer, fbo, args.frames)
+
+        print(f'{n:8,} {n_groups:>5} / {len(app.scene.objects):<7,}'
+              f'{per_object[0] * 1000:9.1f} ms ({per_object[1] * 1000:7.1f}) '
+              f'{instanced[0] * 1000:9.1f} ms ({instanced[1] * 1000:7.1f}) '
+              f'{per_object[0] / instanced[0]:7.0f}x')
+        renderer.destroy()
+    print('submit time per frame, (until the GPU finishes) in brackets')
+    mesh.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Quarterly panel of many tickers: get_statements + pandas per ticker vs
+FinancialPanel.load, checking both agree when a metric is reported in more
+than one statement type
+
+    python -m benchmarks.bench_panel --tickers 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from market.panel import QUARTERLY_STATEMENT_TYPES, FinancialPanel
+from market.sql import FinancialDatabase
+
+# reported in the balance sheet and the cash flow, like yfinance's Net Income in
+# the income statement and the cash flow; stored rows list the cash flow last
+SHARED_METRICS = ('Shared 0', 'Shared 1')
+SHARED_IN = ('Quarterly Balance Sheet', 'Quarterly Cash Flow')
+
+
+def make_panel_statements(n_tickers, n_metrics, n_dates, seed=0):
+    """{ticker: {statement_type: metrics x quarter-end frame}}, latest quarter first"""
+    rng = np.random.default_rng(seed)
+    statements = {}
+    for t in range(n_tickers):
+        # tickers report different numbers of quarters
+        dates = pd.date_range(end='2024-12-31', periods=n_dates - t % 3, freq='QE')[::-1]
+        statements[f'T{t:04d}'] = ticker_statements = {}
+        for statement_type in QUARTERLY_STATEMENT_TYPES:
+            metrics = [f'{statement_type} {i}' for i in range(n_metrics)]
+            if statement_type in SHARED_IN:
+                metrics += SHARED_METRICS
+            ticker_statements[statement_type] = pd.DataFrame(
+                rng.normal(1e9, 1e8, (len(metrics), len(dates))), index=metrics, columns=dates)
+        # gaps in the preferred statement let the other one show through
+        shared = ticker_statements[SHARED_IN[0]].loc[list(SHARED_METRICS)]
+        shared.iloc[:, ::3] = np.nan
+        ticker_statements[SHARED_IN[0]].loc[list(SHARED_METRICS)] = shared
+    return statements
+
+
+def loop_panel(fd, tickers, metrics, quarters):
+    """the per-ticker way: merge statements, earlier types first, keep the latest quarters"""
+    values = np.full((len(tickers), len(metrics), quarters), np.nan)
+    for i, ticker in enumerate(tickers):
+        merged = pd.DataFrame()
+        for df in fd.get_statements(ticker, QUARTERLY_STATEMENT_TYPES).values():
+            merged = df if merged.empty else merged.combine_first(df)
+        merged = merged.sort_index(axis=1).iloc[:, -quarters:].reindex(metrics)
+        values[i, :, quarters - merged.shape[1]:] = merged.to_numpy(dtype='f8')
+    return values
+
+
+def run(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<16} {elapsed * 1000:10.1f} ms')
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--metrics', type=int, default=30)
+    parser.add_argument('--dates', type=int, default=24)
+    parser.add_argument('--quarters', type=int, default=20)
+    parser.add_argument('--compact', action='store_true', help='use the compact layout')
+    args = parser.parse_args()
+
+    statements = make_panel_statements(args.tickers, args.metrics, args.dates)
+    tickers = list(statements)
+    with tempfile.TemporaryDirectory() as tmp:
+        fd = FinancialDatabase(os.path.join(tmp, 'panel.db'), compact=args.compact)
+        fd.bulk_update_financial_data(statements)
+
+        load, panel = run('FinancialPanel', lambda: FinancialPanel.load(fd, tickers, quarters=args.quarters))
+        loop, expected = run('ticker loop', lambda: loop_panel(fd, tickers, panel.metrics, args.quarters))
+        np.testing.assert_array_equal(panel.values, expected)
+        print(f'panels match, {len(SHARED_METRICS)} metrics in both {" and ".join(SHARED_IN)}')
+        print(f'speedup          {loop / load:8.1f}x')
+        fd.close()
+
+
+if __name__ == '__main__':
+    main()
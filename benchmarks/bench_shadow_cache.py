@@ -0,0 +1,83 @@
+"""
+Shadow pass time: redrawing every caster each frame vs the cached static
+depth map plus the moving casters, from 1k to 100k cubes
+
+    python -m benchmarks.bench_shadow_cache --counts 1000 10000 100000 --backend egl
+"""
+import argparse
+import time
+
+import moderngl as mgl
+import numpy as np
+import pygame as pg
+
+from benchmarks.bench_instancing import WIN_SIZE, BenchApp
+from core import SceneRenderer
+
+
+def full_redraw(renderer):
+    """the shadow pass before the cache: clear, then every caster"""
+    def render_shadow():
+        renderer.depth_fbo.clear()
+        renderer.depth_fbo.use()
+        renderer.queue.render_static_shadow()
+        renderer.queue.render_dynamic_shadow()
+    return render_shadow
+
+
+def shadow_time(renderer, frames):
+    """seconds per shadow pass, until the GPU is done, and the last shadow map"""
+    ctx = renderer.ctx
+    app = renderer.app
+    total = 0.0
+    for i in range(frames + 1):
+        app.time = i * 0.016
+        # as render() does: the shadow programs read the light matrices from it
+        renderer.mesh.vao.program.write_frame(app.camera, app.light)
+        renderer.update()
+        ctx.finish()
+        start = time.perf_counter()
+        renderer.render_shadow()
+        ctx.finish()
+        # the first frame also fills the cache
+        if i:
+            total += time.perf_counter() - start
+    depth = np.frombuffer(renderer.depth_texture.read(), dtype='f4')
+    return total / frames, depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--frames', type=int, default=10)
+    parser.add_argument('--backend', default=None, help='moderngl standalone backend, e.g. egl')
+    args = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode((1, 1))
+    ctx = mgl.create_standalone_context(**({'backend': args.backend} if args.backend else {}))
+    mesh = BenchApp(ctx, 0).mesh
+    print(f'{ctx.info["GL_RENDERER"]}')
+    print(f'{"cubes":>8} {"casters":>8} {"covered":>8} {"redraw":>10} {"cached":>10} {"speedup":>8}')
+
+    for n in args.counts:
+        app = BenchApp(ctx, n, mesh)
+        renderer = SceneRenderer(app)
+        renderer.group_objects()
+        renderer.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE)
+        cached, cached_depth = shadow_time(renderer, args.frames)
+        casters = renderer.culler.shadow_visible
+        renderer.render_shadow = full_redraw(renderer)
+        redraw, redraw_depth = shadow_time(renderer, args.frames)
+        # both ways must produce the same map, up to the copy's depth rounding
+        assert np.abs(cached_depth - redraw_depth).max() < 1e-6
+        covered = (redraw_depth < 1.0).mean()
+        print(f'{n:8,} {casters:8,} {covered:8.0%} {redraw * 1000:8.2f}ms {cached * 1000:8.2f}ms '
+              f'{redraw / cached:7.1f}x')
+        renderer.destroy()
+    print(f'shadow map {WIN_SIZE[0]}x{WIN_SIZE[1]}, one moving caster')
+    mesh.destroy()
+
+
+if __name__ == '__main__':
+    main()
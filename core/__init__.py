@@ -3,5 +3,7 @@ from .camera import Camera
 from .light import Light
 from .mesh import Mesh
 from .scene import Scene
+from .instancing import InstanceGroup
 from .scene_renderer import SceneRenderer
-from .hud_renderer import *
\ No newline at end of file
+from .hud_renderer import *
+from .candlestick_renderer import CandlestickRenderer
\ No newline at end of file
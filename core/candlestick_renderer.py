@@ -0,0 +1,139 @@
+import numpy as np
+import pygame as pg
+import moderngl as mgl
+from .shader_program import ChartShaderProgram
+
+# vertices generated per bar by candlestick.vert: body, wick, volume quads
+VERTICES_PER_BAR = 18
+# per-instance layout: bar index, open, high, low, close, volume
+INSTANCE_FORMAT = '1f 4f 1f/i'
+INSTANCE_STRIDE = 6 * 4
+# (location, format, byte offset within one instance) for vao.bind
+INSTANCE_ATTRIBUTES = ((0, '1f', 0), (1, '4f', 4), (2, '1f', 20))
+
+
+class CandlestickRenderer:
+    """
+    Candlestick and volume chart drawn with one instanced call
+
+    OHLCV arrays are uploaded once as an instance buffer; panning and
+    zooming only change uniforms. Accepts get_stock_data output or an
+    OHLCVView from the price history store.
+    """
+    def __init__(self, app, rect=(-0.95, -0.95, 0.95, -0.3), volume_pane=0.25, body_width=0.7):
+        self.app = app
+        self.ctx = app.ctx
+        self.shader_program = ChartShaderProgram(self.ctx)
+        self.program = self.shader_program.programs['candlestick']
+        self.rect = rect
+        self.program['u_volume_pane'] = volume_pane
+        self.program['u_body_width'] = body_width
+        self.program['u_pixel'] = (2 / app.WIN_SIZE[0], 2 / app.WIN_SIZE[1])
+        self.program['u_up_color'] = (0.078, 0.824, 0.431, 1.0)
+        self.program['u_down_color'] = (0.914, 0.243, 0.243, 1.0)
+        self.instance_vbo = None
+        self.vao = None
+        self.n_bars = 0
+        self.high = self.low = self.volume = None
+        self.x_range = (0.0, 1.0)
+        # instances actually submitted: bars [first_bar, first_bar + n_visible)
+        self.first_bar = self.n_visible = 0
+
+    def set_data(self, data):
+        """Upload a whole price series; replaces any previous one"""
+        n_bars = len(data['Close'])
+        instances = np.empty((n_bars, 6), dtype='f4')
+        instances[:, 0] = np.arange(n_bars, dtype='f4')
+        for i, column in enumerate(('Open', 'High', 'Low', 'Close', 'Volume'), start=1):
+            instances[:, i] = np.asarray(data[column], dtype='f4')
+        # kept for autoscaling the visible window
+        self.high, self.low, self.volume = instances[:, 2], instances[:, 3], instances[:, 5]
+
+        self.release_buffers()
+        self.n_bars = n_bars
+        self.first_bar = self.n_visible = 0
+        if not n_bars:
+            return
+        self.instance_vbo = self.ctx.buffer(instances)
+        self.vao = self.ctx.vertex_array(
+            self.program, [(self.instance_vbo, INSTANCE_FORMAT, 'in_index', 'in_ohlc', 'in_volume')])
+        self.set_view(0, n_bars - 1)
+
+    def set_view(self, first, last):
+        """Show bars first..last and rescale price and volume to them"""
+        first, last = max(0.0, first), min(float(self.n_bars - 1), last)
+        if last - first < 1:
+            return
+        self.x_range = (first, last)
+        self.program['u_x_range'] = self.x_range
+        lo, hi = int(first), int(np.ceil(last)) + 1
+        self.program['u_price_range'] = (float(self.low[lo:hi].min()), float(self.high[lo:hi].max()))
+        self.program['u_volume_max'] = float(self.volume[lo:hi].max())
+        self.bind_window(lo, min(hi, self.n_bars))
+
+    def bind_window(self, lo, hi):
+        """Point the instance attributes at bars lo..hi so only those are drawn"""
+        self.n_visible = hi - lo
+        if lo == self.first_bar:
+            return
+        self.first_bar = lo
+        base = lo * INSTANCE_STRIDE
+        for location, fmt, offset in INSTANCE_ATTRIBUTES:
+            self.vao.bind(location, 'f', self.instance_vbo, fmt,
+                          offset=base + offset, stride=INSTANCE_STRIDE, divisor=1)
+
+    def pan(self, bars):
+        first, last = self.x_range
+        bars = max(-first, min(bars, self.n_bars - 1 - last))
+        self.set_view(first + bars, last + bars)
+
+    def zoom(self, factor, anchor=0.5):
+        """Scale the visible span by factor around a fraction of its width"""
+        first, last = self.x_range
+        pivot = first + (last - first) * anchor
+        span = min(max((last - first) * factor, 10), self.n_bars - 1)
+        first = max(0.0, pivot - span * anchor)
+        self.set_view(first, first + span)
+
+    def handle_event(self, event):
+        if not self.n_bars:
+            return
+        span = self.x_range[1] - self.x_range[0]
+        if event.type == pg.MOUSEWHEEL:
+            self.zoom(0.8 if event.y > 0 else 1.25)
+        elif event.type == pg.KEYDOWN and event.key == pg.K_LEFT:
+            self.pan(-span * 0.1)
+        elif event.type == pg.KEYDOWN and event.key == pg.K_RIGHT:
+            self.pan(span * 0.1)
+
+    def viewport(self):
+        """Chart rect in window pixels, used as scissor box"""
+        w, h = self.app.WIN_SIZE
+        x0, y0, x1, y1 = self.rect
+        return (int((x0 + 1) * w / 2), int((y0 + 1) * h / 2),
+                int((x1 - x0) * w / 2), int((y1 - y0) * h / 2))
+
+    def render(self):
+        if self.vao is None:
+            return
+        self.ctx.disable(mgl.DEPTH_TEST | mgl.CULL_FACE)
+        self.ctx.enable(mgl.BLEND)
+        self.program['u_rect'] = self.rect
+        # the partial bars at either edge are clipped to the chart rect
+        self.ctx.scissor = self.viewport()
+        self.vao.render(mgl.TRIANGLES, vertices=VERTICES_PER_BAR, instances=self.n_visible)
+        self.ctx.scissor = None
+        # back to the 3D state, which the scene passes don't reset in full
+        self.ctx.disable(mgl.BLEND)
+        self.ctx.enable(mgl.DEPTH_TEST | mgl.CULL_FACE)
+
+    def release_buffers(self):
+        if self.vao is not None:
+            self.vao.release()
+            self.instance_vbo.release()
+            self.vao = self.instance_vbo = None
+
+    def destroy(self):
+        """release buffers and shaders"""
+        self.release_buffers()
+        self.shader_program.destroy()
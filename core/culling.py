@@ -0,0 +1,101 @@
+import numpy as np
+
+# corners of the cube around a unit sphere
+CUBE_CORNERS = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype='f4')
+
+
+def frustum_planes(m_proj_view):
+    """(6, 4) planes (normal, d), normalized, with normal . p + d >= 0 inside the frustum"""
+    # glm is column-major, so the transposed buffer has the matrix rows
+    rows = np.frombuffer(m_proj_view.to_bytes(), dtype='f4').reshape(4, 4).T
+    planes = np.array([rows[3] + rows[0], rows[3] - rows[0],
+                       rows[3] + rows[1], rows[3] - rows[1],
+                       rows[3] + rows[2], rows[3] - rows[2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+
+def footprint(centers, radii, m_proj_view, size):
+    """
+    Pixel rectangle (x, y, width, height) of a viewport of size covering the
+    spheres as seen through m_proj_view; None when they cover nothing
+    """
+    if not len(centers):
+        return None
+    corners = (centers[:, None] + radii[:, None, None] * CUBE_CORNERS).reshape(-1, 3)
+    columns = np.frombuffer(m_proj_view.to_bytes(), dtype='f4').reshape(4, 4)
+    clip = corners @ columns[:3] + columns[3]
+    if (clip[:, 3] <= 0).any():
+        # reaches behind the eye, no bounded projection
+        return (0, 0, *size)
+    ndc = clip[:, :2] / clip[:, 3:]
+    # a pixel of margin against rounding at the edges
+    low = np.clip(np.floor((ndc.min(axis=0) + 1) / 2 * size) - 1, 0, size).astype(int)
+    high = np.clip(np.ceil((ndc.max(axis=0) + 1) / 2 * size) + 1, 0, size).astype(int)
+    if (high <= low).any():
+        return None
+    return (*low.tolist(), *(high - low).tolist())
+
+
+class FrustumCuller:
+    """
+    World bounding spheres of every instance in the scene, in two contiguous
+    arrays shared with the InstanceGroups
+
+    cull tests all of them against the camera frustum and the light frustum
+    of the shadow pass, one vectorized test each, and has every group pack
+    only its instances inside. visible / culled and shadow_visible /
+    shadow_culled count the instances of the last frame. static_changed
+    is set when the static casters in the light frustum change, and stays
+    set until the cached shadow map is redrawn.
+    """
+    def __init__(self):
+        self.groups = []
+        self.offsets = np.zeros(1, dtype=int)
+        self.centers = np.empty((0, 3), dtype='f4')
+        self.radii = np.empty(0, dtype='f4')
+        self.visible = self.culled = self.shadow_visible = self.shadow_culled = 0
+        self.static_changed = True
+
+    def set_groups(self, groups):
+        """Gather the groups' bounds and leave each group a view into the shared arrays"""
+        self.groups = list(groups)
+        self.offsets = np.cumsum([0, *(len(group.objects) for group in self.groups)])
+        if self.groups:
+            self.centers = np.concatenate([group.centers for group in self.groups])
+            self.radii = np.concatenate([group.radii for group in self.groups])
+        else:
+            self.centers = np.empty((0, 3), dtype='f4')
+            self.radii = np.empty(0, dtype='f4')
+        for group, start, end in zip(self.groups, self.offsets[:-1], self.offsets[1:]):
+            group.centers = self.centers[start:end]
+            group.radii = self.radii[start:end]
+        self.static_changed = True
+
+    def inside(self, m_proj_view):
+        """Mask of the spheres at least partly inside the frustum of m_proj_view"""
+        planes = frustum_planes(m_proj_view)
+        # (6, n) so the test reduces over the long axis, in place
+        distances = planes[:, :3] @ self.centers.T
+        distances += planes[:, 3:]
+        distances += self.radii
+        return (distances >= 0).all(axis=0)
+
+    def dynamic_casters(self):
+        """(centers, radii) of the dynamic instances inside the light frustum"""
+        casters = [(group.centers[group.dynamic_casters], group.radii[group.dynamic_casters])
+                   for group in self.groups if group.dynamic]
+        if not casters:
+            return np.empty((0, 3), dtype='f4'), np.empty(0, dtype='f4')
+        centers, radii = zip(*casters)
+        return np.concatenate(centers), np.concatenate(radii)
+
+    def cull(self, m_proj_view, m_shadow_proj_view):
+        visible = self.inside(m_proj_view)
+        shadow_visible = self.inside(m_shadow_proj_view)
+        for group, start, end in zip(self.groups, self.offsets[:-1], self.offsets[1:]):
+            if group.cull(visible[start:end], shadow_visible[start:end]):
+                self.static_changed = True
+        self.visible = int(np.count_nonzero(visible))
+        self.shadow_visible = int(np.count_nonzero(shadow_visible))
+        self.culled = len(visible) - self.visible
+        self.shadow_culled = len(shadow_visible) - self.shadow_visible
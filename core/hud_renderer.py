@@ -1,7 +1,6 @@
 import numpy as np
 import pygame as pg
 import moderngl as mgl
-from memory_profiler import profile
 from .shader_program import HUDShaderProgram
 
 
@@ -20,7 +19,7 @@ class FPSLabel:
             renderer.shader_program.programs['hud'], self.vbo, 'in_position', 'in_texcoord'
         )
 
-    # @profile
+    # @profile  (injected by `python -m memory_profiler main.py`)
     def render(self, text):
         # Check if the new text has different dimensions
         text_size = self.font.size(text)
@@ -76,6 +75,8 @@ class HUDRenderer:
         self.app.ctx.disable(mgl.DEPTH_TEST | mgl.CULL_FACE)
         self.app.ctx.enable(mgl.BLEND)
         self.FPSLabel.render(text)
+        self.app.ctx.disable(mgl.BLEND)
+        self.app.ctx.enable(mgl.DEPTH_TEST | mgl.CULL_FACE)
 
     def destroy(self):
         """release texture objects"""
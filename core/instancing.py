@@ -0,0 +1,143 @@
+import numpy as np
+
+# bytes of one model matrix in the instance buffer
+INSTANCE_STRIDE = 16 * 4
+
+
+class InstanceGroup:
+    """
+    Objects sharing a vao_name and texture, drawn with one instanced call per pass
+
+    Model matrices are kept in a NumPy array along with each instance's world
+    bounding sphere. Each pass has its own instance buffer, and only the
+    instances inside that pass's frustum are packed into it (see cull).
+    Objects flagged dynamic are updated every frame and cast their shadows
+    from a buffer of their own, so the static casters can be cached.
+    """
+    def __init__(self, mesh, objects):
+        first = objects[0]
+        self.objects = objects
+        self.texture = first.texture
+        self.program = first.program
+        vbo = mesh.vao.vbo.vbos[first.vao_name]
+        self.matrices = np.frombuffer(b''.join(obj.m_model.to_bytes() for obj in objects),
+                                      dtype='f4').reshape(len(objects), 16).copy()
+        # bounding sphere of the mesh, then of every instance in world space
+        self.center, self.radius = vbo.bounds
+        self.centers, self.radii = self.world_bounds(self.matrices)
+        self.instance_vbo = mesh.vao.ctx.buffer(self.matrices)
+        self.shadow_instance_vbo = mesh.vao.ctx.buffer(self.matrices)
+        self.vao = mesh.vao.get_vao(self.program, vbo, self.instance_vbo)
+        self.shadow_vao = mesh.vao.get_vao(first.shadow_program, vbo, self.shadow_instance_vbo)
+        self.is_dynamic = np.array([obj.dynamic for obj in objects])
+        self.dynamic = np.flatnonzero(self.is_dynamic).tolist()
+        self.dynamic_shadow_vbo = self.dynamic_shadow_vao = None
+        if self.dynamic:
+            self.dynamic_shadow_vbo = mesh.vao.ctx.buffer(reserve=len(self.dynamic) * INSTANCE_STRIDE)
+            self.dynamic_shadow_vao = mesh.vao.get_vao(first.shadow_program, vbo, self.dynamic_shadow_vbo)
+        # instances in each buffer and the visibility masks they were packed for;
+        # the shadow buffer holds the static casters only
+        self.count = len(objects)
+        self.shadow_count = self.dynamic_shadow_count = 0
+        # indices of the dynamic instances inside the light frustum
+        self.dynamic_casters = []
+        self.visible = self.shadow_visible = None
+        # instance order changed, the buffers must be repacked
+        self.reordered = False
+
+    def world_bounds(self, matrices):
+        """(centers, radii) of the mesh's bounding sphere under each model matrix"""
+        # column-major: row k of each 4x4 is column k of the matrix
+        columns = matrices.reshape(-1, 4, 4)[:, :, :3]
+        centers = np.einsum('k,nkj->nj', self.center, columns[:, :3]) + columns[:, 3]
+        radii = self.radius * np.linalg.norm(columns[:, :3], axis=2).max(axis=1)
+        return centers.astype('f4'), radii.astype('f4')
+
+    def update(self):
+        """Update the dynamic objects, their matrices and bounds"""
+        for i in self.dynamic:
+            obj = self.objects[i]
+            obj.update()
+            self.matrices[i] = np.frombuffer(obj.m_model.to_bytes(), dtype='f4')
+        if self.dynamic:
+            self.centers[self.dynamic], self.radii[self.dynamic] = self.world_bounds(self.matrices[self.dynamic])
+
+    def cull(self, visible, shadow_visible):
+        """
+        Pack the instances inside the camera frustum, and the static and the
+        dynamic casters inside the light frustum; boolean masks over objects
+        Returns whether the set of static casters changed
+        """
+        self.visible, self.count, _ = self.pack(self.instance_vbo, visible, self.visible, self.count)
+        self.shadow_visible, self.shadow_count, changed = self.pack(
+            self.shadow_instance_vbo, shadow_visible & ~self.is_dynamic, self.shadow_visible, self.shadow_count)
+        if self.dynamic:
+            self.dynamic_casters = [i for i in self.dynamic if shadow_visible[i]]
+            self.dynamic_shadow_vbo.write(self.matrices[self.dynamic_casters])
+            self.dynamic_shadow_count = len(self.dynamic_casters)
+        self.reordered = False
+        return changed
+
+    def pack(self, buffer, mask, packed, count):
+        """(mask, count, whether the packed instances changed) after packing mask into buffer"""
+        if packed is None or not np.array_equal(mask, packed):
+            buffer.write(self.matrices[mask])
+            return mask.copy(), int(np.count_nonzero(mask)), True
+        if self.reordered:
+            # the same instances in a new order
+            buffer.write(self.matrices[mask])
+            return packed, count, False
+        # same instances as last frame, only the dynamic ones moved
+        if self.dynamic:
+            slots = np.cumsum(mask) - 1
+            for i in self.dynamic:
+                if mask[i]:
+                    buffer.write(self.matrices[i], offset=int(slots[i]) * INSTANCE_STRIDE)
+        return packed, count, False
+
+    def sort_instances(self, eye):
+        """Reorder instances nearest to eye first; returns the nearest distance"""
+        distances = np.linalg.norm(self.matrices[:, 12:15] - eye, axis=1)
+        order = np.argsort(distances, kind='stable')
+        if (order != np.arange(len(order))).any():
+            self.objects = [self.objects[i] for i in order]
+            self.matrices = self.matrices[order]
+            # in place, the bounds may be views into FrustumCuller's arrays
+            self.centers[:] = self.centers[order]
+            self.radii[:] = self.radii[order]
+            self.is_dynamic = self.is_dynamic[order]
+            self.dynamic = np.flatnonzero(self.is_dynamic).tolist()
+            # keep the packed masks comparable, repack on the next cull
+            if self.visible is not None:
+                self.visible = self.visible[order]
+            if self.shadow_visible is not None:
+                self.shadow_visible = self.shadow_visible[order]
+            self.reordered = True
+        return float(distances[order[0]])
+
+    def render(self):
+        self.texture.use(location=0)
+        self.vao.render(instances=self.count)
+
+    def render_static_shadow(self):
+        self.shadow_vao.render(instances=self.shadow_count)
+
+    def render_dynamic_shadow(self):
+        self.dynamic_shadow_vao.render(instances=self.dynamic_shadow_count)
+
+    def release(self):
+        self.vao.release()
+        self.shadow_vao.release()
+        self.instance_vbo.release()
+        self.shadow_instance_vbo.release()
+        if self.dynamic:
+            self.dynamic_shadow_vao.release()
+            self.dynamic_shadow_vbo.release()
+
+
+def group_objects(mesh, objects):
+    """One InstanceGroup per (vao_name, tex_id), in order of first appearance"""
+    groups = {}
+    for obj in objects:
+        groups.setdefault((obj.vao_name, obj.tex_id), []).append(obj)
+    return [InstanceGroup(mesh, group) for group in groups.values()]
@@ -1,6 +1,9 @@
 import glm
 
 class BaseModel:
+    # objects whose update() changes m_model every frame
+    dynamic = False
+
     def __init__(self, app, vao_name, tex_id, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1)):
         self.app = app
         self.pos = pos
@@ -33,25 +36,13 @@ class BaseModel:
 
 
 class ExtendedBaseModel(BaseModel):
+    """Lit, shadow-casting model; SceneRenderer draws these through an InstanceGroup"""
     def __init__(self, app, vao_name, tex_id, pos, rot, scale):
         super().__init__(app, vao_name, tex_id, pos, rot, scale)
         self.on_init()
 
-    def update(self):
-        self.texture.use(location=0)
-        self.program['camPos'].write(self.camera.position)
-        self.program['m_view'].write(self.camera.m_view)
-        self.program['m_model'].write(self.m_model)
-
-    def update_shadow(self):
-        self.shadow_program['m_model'].write(self.m_model)
-
-    def render_shadow(self):
-        self.update_shadow()
-        self.shadow_vao.render()
-
     def on_init(self):
-        self.program['m_view_light'].write(self.app.light.m_view_light)
+        # camera and light come from the Frame block, see ShaderProgram.write_frame
         # resolution
         self.program['u_resolution'].write(glm.vec2(self.app.WIN_SIZE))
         # depth texture
@@ -61,22 +52,10 @@ class ExtendedBaseModel(BaseModel):
         # shadow
         self.shadow_vao = self.app.mesh.vao.vaos['shadow_' + self.vao_name]
         self.shadow_program = self.shadow_vao.program
-        self.shadow_program['m_proj'].write(self.camera.m_proj)
-        self.shadow_program['m_view_light'].write(self.app.light.m_view_light)
-        self.shadow_program['m_model'].write(self.m_model)
         # texture
         self.texture = self.app.mesh.texture.textures[self.tex_id]
         self.program['u_texture_0'] = 0
         self.texture.use(location=0)
-        # mvp
-        self.program['m_proj'].write(self.camera.m_proj)
-        self.program['m_view'].write(self.camera.m_view)
-        self.program['m_model'].write(self.m_model)
-        # light
-        self.program['light.position'].write(self.app.light.position)
-        self.program['light.Ia'].write(self.app.light.Ia)
-        self.program['light.Id'].write(self.app.light.Id)
-        self.program['light.Is'].write(self.app.light.Is)
 
 
 class Cube(ExtendedBaseModel):
@@ -85,12 +64,13 @@ class Cube(ExtendedBaseModel):
 
 
 class MovingCube(Cube):
+    dynamic = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def update(self):
         self.m_model = self.get_model_matrix()
-        super().update()
 
 
 class Cat(ExtendedBaseModel):
@@ -105,17 +85,11 @@ class SkyBox(BaseModel):
         super().__init__(app, vao_name, tex_id, pos, rot, scale)
         self.on_init()
 
-    def update(self):
-        self.program['m_view'].write(glm.mat4(glm.mat3(self.camera.m_view)))
-
     def on_init(self):
         # texture
         self.texture = self.app.mesh.texture.textures[self.tex_id]
         self.program['u_texture_skybox'] = 0
         self.texture.use(location=0)
-        # mvp
-        self.program['m_proj'].write(self.camera.m_proj)
-        self.program['m_view'].write(glm.mat4(glm.mat3(self.camera.m_view)))
 
 
 class AdvancedSkyBox(BaseModel):
@@ -124,10 +98,6 @@ class AdvancedSkyBox(BaseModel):
         super().__init__(app, vao_name, tex_id, pos, rot, scale)
         self.on_init()
 
-    def update(self):
-        m_view = glm.mat4(glm.mat3(self.camera.m_view))
-        self.program['m_invProjView'].write(glm.inverse(self.camera.m_proj * m_view))
-
     def on_init(self):
         # texture
         self.texture = self.app.mesh.texture.textures[self.tex_id]
@@ -0,0 +1,65 @@
+import numpy as np
+
+# camera travel, in world units, before instances are re-sorted; also the depth bucket width
+DEPTH_BUCKET = 4.0
+
+
+class RenderQueue:
+    """
+    Instance groups in draw order, sorted by (program, VAO, texture, depth bucket)
+
+    Consecutive draws that share the bound program or texture skip the bind.
+    Within a group, opaque instances are drawn front to back, so the depth
+    test rejects hidden fragments before they are shaded. draws,
+    program_binds and texture_binds count what the last frame submitted.
+    """
+    def __init__(self):
+        self.groups = []
+        # camera position of the last sort
+        self.eye = None
+        self.draws = self.program_binds = self.texture_binds = 0
+
+    def set_groups(self, groups):
+        self.groups = list(groups)
+        self.eye = None
+
+    def begin_frame(self, eye):
+        """Reset the counters; re-sort once the camera has moved a depth bucket"""
+        self.draws = self.program_binds = self.texture_binds = 0
+        eye = np.array(eye, dtype='f4')
+        if self.eye is not None and np.linalg.norm(eye - self.eye) < DEPTH_BUCKET:
+            return
+        self.eye = eye
+        buckets = {id(group): int(group.sort_instances(eye) // DEPTH_BUCKET) for group in self.groups}
+        self.groups.sort(key=lambda group: (group.program.glo, group.vao.glo, group.texture.glo,
+                                            buckets[id(group)]))
+
+    # shadow passes are depth only, one program and no textures
+
+    def render_static_shadow(self):
+        for group in self.groups:
+            if group.shadow_count:
+                group.render_static_shadow()
+                self.draws += 1
+
+    def render_dynamic_shadow(self):
+        for group in self.groups:
+            if group.dynamic_shadow_count:
+                group.render_dynamic_shadow()
+                self.draws += 1
+
+    def render(self):
+        program = texture = None
+        for group in self.groups:
+            if not group.count:
+                continue
+            # moderngl selects the program on every draw; this counts actual switches
+            if group.program is not program:
+                program = group.program
+                self.program_binds += 1
+            if group.texture is not texture:
+                texture = group.texture
+                texture.use(location=0)
+                self.texture_binds += 1
+            group.vao.render(instances=group.count)
+            self.draws += 1
@@ -5,12 +5,15 @@ class Scene:
     def __init__(self, app):
         self.app = app
         self.objects = []
+        # bumped on every change to objects, so renderers know to regroup
+        self.version = 0
         self.load()
         # skybox
         self.skybox = AdvancedSkyBox(app)
 
     def add_object(self, obj):
         self.objects.append(obj)
+        self.version += 1
 
     def load(self):
         app = self.app
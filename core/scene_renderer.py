@@ -1,4 +1,7 @@
 import moderngl as mgl
+from .culling import FrustumCuller, footprint
+from .instancing import group_objects
+from .render_queue import RenderQueue
 
 class SceneRenderer:
     def __init__(self, app):
@@ -9,28 +12,107 @@ class SceneRenderer:
         # depth buffer
         self.depth_texture = self.mesh.texture.textures['depth_texture']
         self.depth_fbo = self.ctx.framebuffer(depth_attachment=self.depth_texture)
+        # static casters only, redrawn when the light or a static caster changes;
+        # each frame starts from a copy of it and adds the dynamic casters
+        self.static_depth_texture = self.ctx.depth_texture(self.depth_texture.size)
+        self.static_depth_texture.compare_func = ''
+        self.static_depth_fbo = self.ctx.framebuffer(depth_attachment=self.static_depth_texture)
+        self.depth_copy_vao = self.mesh.vao.vaos['depth_copy']
+        self.depth_copy_vao.program['u_depth'] = 2
+        # light view and projection the cached map was drawn with
+        self.static_shadow_key = None
+        # pixels of depth_texture holding last frame's dynamic casters
+        self.dynamic_shadow_region = None
+        # where the main pass draws; the window unless pointed elsewhere
+        self.framebuffer = self.ctx.screen
+        # instanced draws, rebuilt whenever the scene's objects change
+        self.groups = []
+        self.scene_version = None
+        # draw order of the groups and per-frame bind / draw counts
+        self.queue = RenderQueue()
+        # instances outside the camera / light frustum are neither uploaded nor drawn
+        self.culler = FrustumCuller()
+
+    def group_objects(self):
+        """Batch scene objects by vao_name and texture"""
+        self.release_groups()
+        self.set_groups(group_objects(self.mesh, self.scene.objects))
+        self.scene_version = self.scene.version
+
+    def set_groups(self, groups):
+        self.groups = groups
+        self.queue.set_groups(groups)
+        self.culler.set_groups(groups)
+
+    def update(self):
+        self.scene.update()
+        if self.scene_version != self.scene.version:
+            self.group_objects()
+        for group in self.groups:
+            group.update()
+        self.queue.begin_frame(self.app.camera.position)
+        camera = self.app.camera
+        # the shadow pass projects with the camera projection from the light
+        self.culler.cull(camera.m_proj * camera.m_view, camera.m_proj * self.app.light.m_view_light)
+
+    def render_static_shadow(self):
+        """Redraw the static casters if the cache is out of date; True if it was"""
+        key = self.app.camera.m_proj.to_bytes() + self.app.light.m_view_light.to_bytes()
+        if not self.culler.static_changed and key == self.static_shadow_key:
+            return False
+        # into the cache and, rather than copying it, straight into the shadow map
+        for fbo in (self.static_depth_fbo, self.depth_fbo):
+            fbo.clear()
+            fbo.use()
+            self.queue.render_static_shadow()
+        self.static_shadow_key = key
+        self.culler.static_changed = False
+        return True
+
+    def copy_static_shadow(self, region=None):
+        """Overwrite region (x, y, width, height) of the shadow map, or all of it, with the static depth"""
+        self.depth_fbo.use()
+        self.depth_fbo.scissor = region
+        self.static_depth_texture.use(location=2)
+        self.ctx.depth_func = '1'
+        self.depth_copy_vao.render()
+        self.ctx.depth_func = '<'
+        self.depth_fbo.scissor = None
 
     def render_shadow(self):
-        self.depth_fbo.clear()
+        # the shadow map keeps the static depth between frames; only where the
+        # moving casters were last frame is put back before they are drawn again
+        if not self.render_static_shadow() and self.dynamic_shadow_region is not None:
+            self.copy_static_shadow(self.dynamic_shadow_region)
         self.depth_fbo.use()
-        for obj in self.scene.objects:
-            obj.render_shadow()
+        self.queue.render_dynamic_shadow()
+        camera = self.app.camera
+        self.dynamic_shadow_region = footprint(*self.culler.dynamic_casters(),
+                                               camera.m_proj * self.app.light.m_view_light, self.depth_texture.size)
 
     def main_render(self):
-        self.app.ctx.screen.use()
-        for obj in self.scene.objects:
-            obj.render()
+        self.framebuffer.use()
+        self.queue.render()
         self.scene.skybox.render()
 
     def render(self):
         # self.ctx.front_face = 'cw'
         self.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE)
-        self.scene.update()
+        # camera and light for every program in one upload
+        self.mesh.vao.program.write_frame(self.app.camera, self.app.light)
+        self.update()
         # pass 1
         self.render_shadow()
         # pass 2
         self.main_render()
 
+    def release_groups(self):
+        for group in self.groups:
+            group.release()
+        self.set_groups([])
+
     def destroy(self):
+        self.release_groups()
         self.depth_fbo.release()
-
+        self.static_depth_fbo.release()
+        self.static_depth_texture.release()
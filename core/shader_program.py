@@ -1,3 +1,11 @@
+import glm
+
+# uniform block binding of Frame, the camera and light state of the 3D shaders
+FRAME_BINDING = 0
+# std140 size of Frame: three mat4, then camPos and the four Light vec3s padded to vec4
+FRAME_SIZE = 3 * 64 + 5 * 16
+
+
 class BaseShaderProgram:
     """Compile frag vert shaders per rendering object"""
     def __init__(self, ctx):
@@ -27,6 +35,25 @@ class ShaderProgram(BaseShaderProgram):
         self.programs['skybox'] = self.get_program('skybox')
         self.programs['advanced_skybox'] = self.get_program('advanced_skybox')
         self.programs['shadow_map'] = self.get_program('shadow_map')
+        self.programs['depth_copy'] = self.get_program('depth_copy')
+        # one Frame buffer shared by every program instead of per-program uniforms
+        self.frame_ubo = ctx.buffer(reserve=FRAME_SIZE)
+        for program in self.programs.values():
+            block = program.get('Frame', None)
+            if block is not None:
+                block.binding = FRAME_BINDING
+
+    def write_frame(self, camera, light):
+        """upload this frame's camera and light state, once for all programs"""
+        vectors = (camera.position, light.position, light.Ia, light.Id, light.Is)
+        self.frame_ubo.write(b''.join([
+            camera.m_proj.to_bytes(), camera.m_view.to_bytes(), light.m_view_light.to_bytes(),
+            *(glm.vec4(vector, 0).to_bytes() for vector in vectors)]))
+        self.frame_ubo.bind_to_uniform_block(FRAME_BINDING)
+
+    def destroy(self):
+        super().destroy()
+        self.frame_ubo.release()
 
 class HUDShaderProgram(BaseShaderProgram):
     """3D shader programs"""
@@ -34,3 +61,8 @@ class HUDShaderProgram(BaseShaderProgram):
         super().__init__(ctx)
         self.programs['hud'] = self.get_program('hud')
 
+class ChartShaderProgram(BaseShaderProgram):
+    """2D chart shader programs"""
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.programs['candlestick'] = self.get_program('candlestick')
@@ -1,6 +1,10 @@
 from .vbo import VBO
 from .shader_program import ShaderProgram
 
+# one column-major model matrix per instance, read as mat4 in_model
+INSTANCE_FORMAT = '16f/i'
+INSTANCE_ATTRIBUTE = 'in_model'
+
 class VAO:
     """Vertex Array Object is an object that stores the format of vertex data 
        and the buffer objects that store the actual vertex data"""
@@ -39,14 +43,22 @@ class VAO:
         self.vaos['advanced_skybox'] = self.get_vao(
             program=self.program.programs['advanced_skybox'],
             vbo=self.vbo.vbos['advanced_skybox'])
-        
+
+        # depth copy vao, the same clip space triangle
+        self.vaos['depth_copy'] = self.get_vao(
+            program=self.program.programs['depth_copy'],
+            vbo=self.vbo.vbos['advanced_skybox'])
+
         #self.vaos['font'] = self.get_vao(
         #    program=self.program.programs['font'],
         #    vbo=self.vbo.vbos['font'])
 
-    def get_vao(self, program, vbo):
-        """create VAO object with shader program and VBO"""
-        vao = self.ctx.vertex_array(program, [(vbo.vbo, vbo.format, *vbo.attribs)], skip_errors=True)
+    def get_vao(self, program, vbo, instance_vbo=None):
+        """create VAO object with shader program and VBO, plus per-instance model matrices"""
+        content = [(vbo.vbo, vbo.format, *vbo.attribs)]
+        if instance_vbo is not None:
+            content.append((instance_vbo, INSTANCE_FORMAT, INSTANCE_ATTRIBUTE))
+        vao = self.ctx.vertex_array(program, content, skip_errors=True)
         return vao
 
     def destroy(self):
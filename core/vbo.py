@@ -1,5 +1,6 @@
+from functools import cached_property
+
 import numpy as np
-import pywavefront
 
 class VBO:
     """Vertex Buffer Object is a buffer that stores vertex data, 
@@ -45,6 +46,19 @@ class BaseVBO:
         vbo = self.ctx.buffer(vertex_data)
         return vbo
 
+    @cached_property
+    def bounds(self):
+        """
+        Bounding sphere (center, radius) of in_position in model space,
+        computed once from the vertex data in the buffer
+        """
+        sizes = [int(attribute[:-1]) for attribute in self.format.split()]
+        position = sum(sizes[:self.attribs.index('in_position')])
+        vertices = np.frombuffer(self.vbo.read(), dtype='f4').reshape(-1, sum(sizes))
+        positions = vertices[:, position:position + 3]
+        center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+        return center, float(np.linalg.norm(positions - center, axis=1).max())
+
     def destroy(self):
         """release vbo object"""
         self.vbo.release()
@@ -102,6 +116,9 @@ class CatVBO(BaseVBO):
         self.attribs = ['in_texcoord_0', 'in_normal', 'in_position']
 
     def get_vertex_data(self):
+        # only needed for OBJ models, keep it off the import path
+        import pywavefront
+
         objs = pywavefront.Wavefront('objects/cat/20430_Cat_v1_NEW.obj', cache=True, parse=True)
         obj = objs.materials.popitem()[1]
         vertex_data = obj.vertices
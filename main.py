@@ -1,8 +1,10 @@
 import sys
+from datetime import date
 import pygame as pg
 import moderngl as mgl
 from core import *
 import market.data as md
+from market.loader import AsyncMarketLoader
 
 
 class GraphicsEngine:
@@ -28,10 +30,15 @@ class GraphicsEngine:
         self.clock = pg.time.Clock()
         self.time = 0
         self.delta_time = 0
-        # yfinance
+        # yfinance, loaded in the background so the first frame isn't blocked
         self.md = md.MarketData()
-        data = self.md.get_basic_fundamentals('AAPL')
-        print(data)
+        self.market_loader = AsyncMarketLoader(self.md)
+        self.fundamentals = {}
+        self.market_loader.submit('get_basic_fundamentals', 'AAPL',
+                                  callback=self.on_fundamentals)
+        self.market_loader.submit('get_stock_data', 'AAPL', '2015-01-01',
+                                  date.today().strftime('%Y-%m-%d'),
+                                  callback=self.on_stock_data)
         # light
         self.light = Light()
         # camera
@@ -44,6 +51,8 @@ class GraphicsEngine:
         self.scene_renderer = SceneRenderer(self)
         # HUD
         self.hud_renderer = HUDRenderer(self)
+        # price chart
+        self.chart_renderer = CandlestickRenderer(self)
 
     def check_events(self):
         for event in pg.event.get():
@@ -51,17 +60,40 @@ class GraphicsEngine:
                 self.mesh.destroy()
                 self.scene_renderer.destroy()
                 self.hud_renderer.destroy()
+                self.chart_renderer.destroy()
+                # a worker still inside a call after the timeout keeps its
+                # connections; the process is exiting anyway
+                if self.market_loader.close():
+                    self.md.close()
                 pg.quit()
                 sys.exit()
+            self.chart_renderer.handle_event(event)
+
+    def on_fundamentals(self, result):
+        if result.error is not None:
+            print(f'Failed to load fundamentals: {result.error}')
+            return
+        self.fundamentals = result.value
+        print(self.fundamentals)
+
+    def on_stock_data(self, result):
+        if result.error is not None:
+            print(f'Failed to load price history: {result.error}')
+            return
+        self.chart_renderer.set_data(result.value)
 
     def render(self):
         # clear framebuffer
         self.ctx.clear(color=(0.08, 0.16, 0.18))
         # render scene
         self.scene_renderer.render()
+        # render price chart
+        self.chart_renderer.render()
         # render hud
         fps = self.clock.get_fps()
-        self.hud_renderer.render(f"FPS: {fps:.2f}")
+        queue, culler = self.scene_renderer.queue, self.scene_renderer.culler
+        self.hud_renderer.render(f"FPS: {fps:.2f}  draws: {queue.draws}  binds: {queue.program_binds + queue.texture_binds}"
+                                 f"  visible: {culler.visible}  culled: {culler.culled}")
         # swap buffers
         pg.display.flip()
 
@@ -72,6 +104,7 @@ class GraphicsEngine:
         while True:
             self.get_time()
             self.check_events()
+            self.market_loader.poll()
             self.camera.update()
             self.render()
             self.delta_time = self.clock.tick(60)
@@ -1,2 +1,49 @@
-from .data import *
-from .sql import *
\ No newline at end of file
+import importlib
+
+# public name -> submodule; submodules (and pandas, yfinance, plotly behind
+# them) are only imported when one of their names is first used
+_EXPORTS = {
+    'MarketData': 'data',
+    'ANNUAL_STATEMENTS': 'data',
+    'QUARTERLY_STATEMENTS': 'data',
+    'STATEMENTS_BY_KIND': 'data',
+    'FinancialDatabase': 'sql',
+    'ConnectionManager': 'sql',
+    'FinancialArray': 'sql',
+    'TTLCache': 'cache',
+    'ReadThroughCache': 'cache',
+    'DEFAULT_TTL': 'cache',
+    'TickerSnapshot': 'snapshot',
+    'SnapshotCache': 'snapshot',
+    'TokenBucket': 'batch',
+    'BatchFetcher': 'batch',
+    'BatchResult': 'batch',
+    'MarketDataProvider': 'provider',
+    'YFinanceProvider': 'provider',
+    'LocalProvider': 'provider',
+    'PriceHistoryStore': 'history',
+    'OHLCVView': 'history',
+    'OHLCPyramid': 'pyramid',
+    'IndicatorEngine': 'indicators',
+    'IndicatorStore': 'indicators',
+    'DEFAULT_INDICATORS': 'indicators',
+    'FinancialPanel': 'panel',
+    'FinancialAsOf': 'panel',
+    'AsyncMarketLoader': 'loader',
+    'LoadResult': 'loader',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    submodule = _EXPORTS.get(name)
+    if submodule is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{submodule}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+# outcome for one ticker of a batch call: exactly one of value / error is set
+BatchResult = namedtuple('BatchResult', ['ticker', 'value', 'error', 'attempts'])
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: `rate` tokens per second, bursts up to `capacity`"""
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them"""
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class BatchFetcher:
+    """
+    Run a per-ticker function over many tickers on a bounded thread pool
+
+    Failures are retried with jittered exponential backoff and isolated to
+    their ticker; results are yielded as they complete. The pool is started
+    on first use and kept, with its threads, until close()
+    """
+    def __init__(self, max_workers=8, retries=3, backoff=0.5, max_backoff=30.0, sleep=time.sleep):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers)
+            return self._pool
+
+    def call(self, fn, ticker):
+        """Call fn(ticker) with retries, never raising"""
+        for attempt in range(1, self.retries + 2):
+            try:
+                return BatchResult(ticker, fn(ticker), None, attempt)
+            except Exception as error:
+                if attempt > self.retries:
+                    return BatchResult(ticker, None, error, attempt)
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                self.sleep(delay * random.uniform(0.5, 1.0))
+
+    def run(self, fn, tickers):
+        """Yield a BatchResult per distinct ticker in completion order"""
+        pool = self.pool()
+        futures = [pool.submit(self.call, fn, ticker) for ticker in dict.fromkeys(tickers)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # consumer stopped early: don't start the remaining tickers,
+            # and return only once the running ones are done
+            for future in futures:
+                future.cancel()
+            wait(futures)
+
+    def close(self):
+        """Shut the pool down; a later run() starts a new one"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,217 @@
+"""
+Bulk import of long-form financial data files into FinancialDatabase
+
+    python -m market.bulk_load dump.csv more.parquet --db financial_statements.db --workers 4
+
+Each file holds one row per value with ticker, statement_type, metric_name,
+date and value columns (other names are mapped with --column). Files are
+read in chunks: byte ranges cut at line ends for CSV, row groups for
+Parquet (which needs pyarrow). Chunks are parsed in this process or on a
+pool of worker processes, and every chunk is written by this process in
+one transaction together with how far into the file it reaches, so an
+interrupted load picks up after the last committed chunk. Statements are
+marked as bulk loaded the first time a chunk of the file touches them,
+and their derived metrics are rebuilt once, after the file's last chunk.
+"""
+import argparse
+import csv
+import io
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from market.lazy import lazy_import
+from market.sql import FinancialDatabase
+
+pd = lazy_import('pandas')
+
+FIELDS = ('ticker', 'statement_type', 'metric_name', 'date', 'value')
+
+# target size of one CSV chunk; a chunk always ends at a line end
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# parsed chunks waiting for the writer, per worker process
+PREFETCH_PER_WORKER = 2
+
+# a piece of one file: byte offsets for CSV, row group indices for Parquet
+Chunk = namedtuple('Chunk', ['path', 'start', 'end'])
+
+BulkLoadResult = namedtuple('BulkLoadResult', ['rows', 'skipped', 'chunks', 'seconds'])
+
+
+def is_parquet(path):
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def parquet_file(path):
+    try:
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError('loading Parquet files needs pyarrow (pip install pyarrow)') from error
+    return pyarrow.parquet.ParquetFile(path)
+
+
+def csv_chunks(path, start=0, chunk_bytes=CHUNK_BYTES):
+    """Chunks of roughly chunk_bytes covering path from byte start, past the header"""
+    with open(path, 'rb') as file:
+        position = max(start, len(file.readline()))
+        size = os.fstat(file.fileno()).st_size
+        while position < size:
+            file.seek(min(position + chunk_bytes, size))
+            # finish the line the cut landed in; quoted fields must not span lines
+            file.readline()
+            end = file.tell()
+            yield Chunk(path, position, end)
+            position = end
+
+
+def parquet_chunks(path, start=0):
+    """One chunk per row group, from row group start"""
+    for row_group in range(start, parquet_file(path).num_row_groups):
+        yield Chunk(path, row_group, row_group + 1)
+
+
+def read_chunk(chunk, columns):
+    """DataFrame of the file columns named in columns.values() within chunk"""
+    usecols = list(dict.fromkeys(columns.values()))
+    if is_parquet(chunk.path):
+        return parquet_file(chunk.path).read_row_groups(
+            range(chunk.start, chunk.end), columns=usecols).to_pandas()
+    with open(chunk.path, 'rb') as file:
+        names = next(csv.reader([file.readline().decode()]))
+        file.seek(chunk.start)
+        data = file.read(chunk.end - chunk.start)
+    text_columns = [columns[field] for field in FIELDS if field != 'value']
+    # keep_default_na off so a ticker like NA survives; blanks are dropped below
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=usecols,
+                       dtype={column: str for column in text_columns}, keep_default_na=False,
+                       float_precision='round_trip')
+
+
+def parse_chunk(chunk, columns, timestamp):
+    """
+    Rows ready for FinancialDatabase.load_rows from one chunk, sorted by key,
+    and the number of rows dropped for a blank key or an unreadable date
+    """
+    frame = read_chunk(chunk, columns)
+    dates = pd.to_datetime(frame[columns['date']], errors='coerce').to_numpy(dtype='datetime64[D]')
+    values = pd.to_numeric(frame[columns['value']], errors='coerce').to_numpy(dtype='f8')
+    valid = ~np.isnat(dates)
+    # sorted codes per key column, so ordering and blank checks run on integers
+    codes, labels = [], []
+    for field in ('ticker', 'statement_type', 'metric_name'):
+        field_codes, field_labels = pd.factorize(frame[columns[field]].fillna(''), sort=True)
+        field_labels = np.asarray(field_labels, dtype=object)
+        valid &= (field_codes >= 0) & (field_labels[field_codes] != '')
+        codes.append(field_codes)
+        labels.append(field_labels)
+    days = dates.astype('i8')
+    # key order keeps the B-tree inserts local; stable, so the last duplicate still wins
+    order = np.flatnonzero(valid)[np.lexsort((days[valid], *(c[valid] for c in codes[::-1])))]
+    values = values[order]
+    # sqlite stores NaN as NULL anyway, make it explicit
+    values = np.where(np.isnan(values), None, values)
+    n_rows = len(values)
+    rows = list(zip(*(field_labels[field_codes[order]].tolist() for field_codes, field_labels in zip(codes, labels)),
+                    np.datetime_as_string(dates[order]).tolist(), values.tolist(), [timestamp] * n_rows))
+    return rows, len(frame) - n_rows
+
+
+def parsed_chunks(chunks, columns, timestamp, pool=None, prefetch=1):
+    """(chunk, parse_chunk result) in file order, at most prefetch chunks ahead on pool"""
+    if pool is None:
+        for chunk in chunks:
+            yield chunk, parse_chunk(chunk, columns, timestamp)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, pool.submit(parse_chunk, chunk, columns, timestamp)))
+        if len(pending) > prefetch:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+    while pending:
+        chunk, future = pending.popleft()
+        yield chunk, future.result()
+
+
+def file_chunks(db, path, chunk_bytes=CHUNK_BYTES, restart=False):
+    """(size, mtime_ns, chunks still to load) for path, resuming from its load_progress"""
+    stat = os.stat(path)
+    start = 0
+    progress = None if restart else db.load_progress(path)
+    if progress is not None and tuple(progress[:2]) == (stat.st_size, stat.st_mtime_ns):
+        start = progress[2]
+    if is_parquet(path):
+        return stat.st_size, stat.st_mtime_ns, parquet_chunks(path, start)
+    return stat.st_size, stat.st_mtime_ns, csv_chunks(path, start, chunk_bytes)
+
+
+def bulk_load(db, paths, columns=None, workers=0, chunk_bytes=CHUNK_BYTES, restart=False, progress=None):
+    """
+    Load CSV / Parquet files into db, a FinancialDatabase or a database path
+    columns maps FIELDS to the file's column names where they differ;
+    workers > 0 parses on that many processes while this one writes;
+    restart ignores the saved position of a file that was loaded before;
+    progress(path, rows, seconds) is called after every committed chunk
+    Returns a BulkLoadResult over all files
+    """
+    if not isinstance(db, FinancialDatabase):
+        db = FinancialDatabase(db)
+    columns = {field: (columns or {}).get(field, field) for field in FIELDS}
+    timestamp = datetime.now().isoformat(' ')
+    rows = skipped = n_chunks = 0
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(workers) if workers > 0 else None
+    try:
+        for path in paths:
+            path = os.path.abspath(path)
+            size, mtime_ns, chunks = file_chunks(db, path, chunk_bytes, restart)
+            marked = set()
+            for chunk, (chunk_rows, chunk_skipped) in parsed_chunks(
+                    chunks, columns, timestamp, pool, PREFETCH_PER_WORKER * workers):
+                rows += db.load_rows(chunk_rows, (path, size, mtime_ns, chunk.end), marked)
+                skipped += chunk_skipped
+                n_chunks += 1
+                if progress is not None:
+                    progress(path, rows, time.perf_counter() - start)
+            # also picks up what an interrupted earlier load left pending
+            db.rebuild_pending_derived()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return BulkLoadResult(rows, skipped, n_chunks, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk load CSV / Parquet financial data files')
+    parser.add_argument('paths', nargs='+', help='CSV or Parquet files, one row per value')
+    parser.add_argument('--db', default='financial_statements.db', help='database file')
+    parser.add_argument('--compact', action='store_true', help='use (or migrate to) the compact layout')
+    parser.add_argument('--workers', type=int, default=0, help='parser processes, 0 parses in-process')
+    parser.add_argument('--chunk-mb', type=float, default=CHUNK_BYTES / 2 ** 20, help='CSV chunk size')
+    parser.add_argument('--column', action='append', default=[], metavar='FIELD=NAME',
+                        help=f'file column holding FIELD, one of {", ".join(FIELDS)}')
+    parser.add_argument('--restart', action='store_true', help='ignore saved progress')
+    args = parser.parse_args(argv)
+
+    columns = dict(mapping.split('=', 1) for mapping in args.column)
+    unknown = set(columns) - set(FIELDS)
+    if unknown:
+        parser.error(f'unknown field(s): {", ".join(sorted(unknown))}')
+
+    def report(path, rows, seconds):
+        print(f'{os.path.basename(path)}: {rows:,} rows  {rows / max(seconds, 1e-9):,.0f} rows/s', flush=True)
+
+    with FinancialDatabase(args.db, compact=args.compact) as db:
+        result = bulk_load(db, args.paths, columns, args.workers, int(args.chunk_mb * 2 ** 20),
+                           args.restart, report)
+    print(f'loaded {result.rows:,} rows in {result.chunks} chunks, {result.seconds:.1f}s '
+          f'({result.rows / max(result.seconds, 1e-9):,.0f} rows/s), skipped {result.skipped:,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+MISSING = object()
+
+# seconds a cached entry stays fresh, per kind of data
+DEFAULT_TTL = {
+    'financials': 24 * 3600,
+    'quarterly': 24 * 3600,
+    'snapshot': 15 * 60,
+}
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a time-to-live"""
+    def __init__(self, maxsize=256, ttl=None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return a live entry and mark it most recently used"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= self.clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires=None):
+        """Insert an entry, expiring at `expires` or after the default ttl"""
+        if expires is None and self.ttl is not None:
+            expires = self.clock() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """Drop every entry, or only those whose key matches predicate"""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+class ReadThroughCache:
+    """
+    Memory LRU in front of a persistent store in front of an upstream fetch
+
+    stats counts 'hits' served from memory, 'db_hits' served from the store
+    and 'misses' that went upstream
+    """
+    def __init__(self, ttl=None, maxsize=256, clock=time.time):
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.clock = clock
+        self.memory = TTLCache(maxsize, clock=clock)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, kind, key, load, fetch):
+        """
+        load(fresh_since) returns (value, checked_at) when the store holds data
+        checked after fresh_since, else None; fetch() goes upstream
+        """
+        value = self.memory.get((kind, key), MISSING)
+        if value is not MISSING:
+            self.count('hits')
+            return value
+
+        ttl = self.ttl[kind]
+        now = self.clock()
+        stored = load(now - ttl)
+        if stored is not None:
+            value, checked_at = stored
+            self.count('db_hits')
+            self.memory.put((kind, key), value, expires=checked_at + ttl)
+            return value
+
+        self.count('misses')
+        value = fetch()
+        self.memory.put((kind, key), value, expires=now + ttl)
+        return value
+
+    def invalidate(self, kind=None, key=None):
+        """Forget memory entries for a kind and/or key, everything by default"""
+        self.memory.invalidate(lambda entry: (kind is None or entry[0] == kind)
+                               and (key is None or entry[1] == key))
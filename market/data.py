@@ -1,13 +1,102 @@
-import yfinance as yf
-import pandas as pd
-from plotly import graph_objects as go
-from datetime import date
+from datetime import date, datetime
+import numpy as np
+from market.lazy import lazy_import
+from market.batch import BatchFetcher, TokenBucket
+from market.cache import ReadThroughCache
+from market.history import PriceHistoryStore
+from market.indicators import IndicatorEngine, IndicatorStore
+from market.panel import FinancialAsOf, FinancialPanel
+from market.provider import YFinanceProvider
+from market.pyramid import PYRAMID_FACTOR, OHLCPyramid, aggregate
+from market.snapshot import SnapshotCache
 from market.sql import FinancialDatabase
 
+pd = lazy_import('pandas')
+
+# statement type stored in FinancialDatabase -> yfinance Ticker attribute
+ANNUAL_STATEMENTS = {
+    'Balance Sheet': 'balance_sheet',
+    'Income Statement': 'income_stmt',
+    'Cash Flow': 'cash_flow',
+}
+
+QUARTERLY_STATEMENTS = {
+    'Quarterly Balance Sheet': 'quarterly_balance_sheet',
+    'Quarterly Income Statement': 'quarterly_income_stmt',
+    'Quarterly Cash Flow': 'quarterly_cash_flow',
+}
+
+STATEMENTS_BY_KIND = {
+    'financials': ANNUAL_STATEMENTS,
+    'quarterly': QUARTERLY_STATEMENTS,
+}
+
 
 class MarketData:
-    def __init__(self):
-        self.fd = FinancialDatabase()
+    def __init__(self, db_path='financial_statements.db', ttl=None, cache_size=256, snapshot_size=128,
+                 provider=None, rate_limit=None, max_workers=8, retries=3, history_root='price_history',
+                 indicators=None, compact_db=False):
+        """
+        provider is the MarketDataProvider behind every upstream fetch,
+        yfinance unless given
+        ttl maps a kind of data ('financials', 'quarterly', 'snapshot') to the
+        number of seconds it is served from cache before going back upstream
+        rate_limit caps upstream requests per second across all threads
+        indicators lists the technical indicators computed over stored
+        history, DEFAULT_INDICATORS unless given
+        compact_db keeps statements in the dictionary-encoded layout, see
+        FinancialDatabase
+        """
+        self.provider = provider if provider is not None else YFinanceProvider()
+        self.fd = FinancialDatabase(db_path, compact=compact_db)
+        self.cache = ReadThroughCache(ttl, maxsize=cache_size)
+        self.limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.snapshots = SnapshotCache(self.provider, snapshot_size, self.cache.ttl['snapshot'], self.limiter)
+        self.batch = BatchFetcher(max_workers, retries)
+        self.history = PriceHistoryStore(history_root, self.download)
+        self.indicators = IndicatorStore(self.history, IndicatorEngine(indicators))
+        # ticker -> (source signature, OHLCPyramid) for chart queries
+        self.pyramids = {}
+
+    @property
+    def fetch_stats(self):
+        """Upstream fetches made so far, per Ticker attribute"""
+        return self.snapshots.stats
+
+    def close(self):
+        self.batch.close()
+        self.fd.close()
+
+    def invalidate(self, ticker_symbol=None, kind=None):
+        """Drop cached data so the next call refetches from the provider"""
+        self.cache.invalidate(kind, ticker_symbol)
+        self.snapshots.invalidate(ticker_symbol)
+        kinds = [kind] if kind else list(STATEMENTS_BY_KIND)
+        statement_types = [name for k in kinds for name in STATEMENTS_BY_KIND[k]]
+        self.fd.expire_statements(ticker_symbol, statement_types)
+
+    def get_statements(self, ticker_symbol, kind):
+        """
+        Read-through fetch of the statements of one kind
+        Returns a dictionary of {statement type: DataFrame}
+        """
+        statement_types = STATEMENTS_BY_KIND[kind]
+
+        def load(fresh_since):
+            checked = self.fd.get_last_update(ticker_symbol, list(statement_types))
+            if checked is None:
+                return None
+            checked = datetime.fromisoformat(checked).timestamp()
+            if checked < fresh_since:
+                return None
+            return self.fd.get_statements(ticker_symbol, statement_types), checked
+
+        def fetch():
+            statements = self.snapshots.get(ticker_symbol).statements(statement_types)
+            self.fd.update_financial_data(ticker_symbol, statements)
+            return statements
+
+        return self.cache.get(kind, ticker_symbol, load, fetch)
 
     def get_stock(self):
         # Parameters for retrieving the stock data
@@ -18,13 +107,15 @@ class MarketData:
         data = self.get_stock_data(selected_stock, start_date, end_date)
         return data
 
+    def download(self, ticker, start, end):
+        """Fetch raw history from the provider, end exclusive"""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        return self.provider.get_history(ticker, start, end)
+
     def get_stock_data(self, ticker, start, end):
-        # downloading the stock data from START to TODAY
-        ticker_data = yf.download(ticker, start, end)
-        ticker_data.reset_index(inplace=True)  # put date in the first column
-        ticker_data['Date'] = pd.to_datetime(
-            ticker_data['Date']).dt.tz_localize(None)
-        return ticker_data
+        # only the days not already in the local history store are downloaded
+        return self.history.get(ticker, start, end)
 
     def get_data_from_range(self, state):
         print("GENERATING HIST DATA")
@@ -42,7 +133,36 @@ class MarketData:
         notify(state, 'w', 'Deleting previous predictions...')
         state.forecast = pd.DataFrame(columns=['Date', 'Lower', 'Upper'])
 
-    def create_candlestick_chart(self, data):
+    def price_pyramid(self, ticker):
+        """Downsampling pyramid over the stored history, reused until it changes"""
+        signature = OHLCPyramid.source_signature(self.history, ticker)
+        cached = self.pyramids.get(ticker)
+        if cached is None or cached[0] != signature:
+            cached = self.pyramids[ticker] = (signature, OHLCPyramid.load(self.history, ticker))
+        return cached[1]
+
+    def get_chart_data(self, ticker, start=None, end=None, width=1000):
+        """
+        Stored bars in [start, end) aggregated to at most about width bars
+        Zooming calls this again with the new range, only that window is read
+        """
+        return self.price_pyramid(ticker).window(start, end, width)
+
+    def create_candlestick_chart(self, data, width=None):
+        """
+        Candlestick figure of data (a frame, dict of columns or OHLCVView)
+        With width, longer series are aggregated to about that many bars
+        """
+        # plotly is only needed for charts, keep it off the startup path
+        from plotly import graph_objects as go
+
+        if width is not None and len(data['Date']) > width:
+            # same bucket sizes as the pyramid levels
+            factor = PYRAMID_FACTOR ** int(np.ceil(np.log(len(data['Date']) / width) / np.log(PYRAMID_FACTOR)))
+            data = aggregate({column: np.asarray(data[column])
+                              for column in ('Date', 'Open', 'High', 'Low', 'Close', 'Volume')
+                              if column in data}, factor)
+
         fig = go.Figure()
         fig.add_trace(go.Candlestick(x=data['Date'],
                                      open=data['Open'],
@@ -54,26 +174,51 @@ class MarketData:
                           xaxis_rangeslider_visible=False)
         return fig
 
+    def batch_stock_data(self, tickers, start, end):
+        """Yield a BatchResult of get_stock_data per ticker as each completes"""
+        return self.batch.run(lambda ticker_symbol: self.get_stock_data(ticker_symbol, start, end), tickers)
+
+    def get_indicators(self, ticker, start, end):
+        """
+        Bars in [start, end) with technical indicator columns added
+        Indicators run over all stored history, only bars new since the
+        last call are computed
+        """
+        self.history.update(ticker, start, end)
+        return self.indicators.get(ticker).slice(start, end).to_frame()
+
+    def batch_indicators(self, tickers, start, end):
+        """Yield a BatchResult of get_indicators per ticker as each completes"""
+        return self.batch.run(lambda ticker_symbol: self.get_indicators(ticker_symbol, start, end), tickers)
+
+    def batch_basic_fundamentals(self, tickers):
+        """Yield a BatchResult of get_basic_fundamentals per ticker as each completes"""
+        return self.batch.run(self.get_basic_fundamentals, tickers)
+
+    def batch_detailed_financials(self, tickers):
+        """Yield a BatchResult of get_detailed_financials per ticker as each completes"""
+        return self.batch.run(self.get_detailed_financials, tickers)
+
     def get_basic_fundamentals(self, ticker_symbol):
         """
         Get basic fundamental data for a given ticker symbol
         Returns a dictionary of key financial metrics
         """
-        # Create a Ticker object
-        ticker = yf.Ticker(ticker_symbol)
+        # Resolve info once from the shared per-ticker snapshot
+        info = self.snapshots.get(ticker_symbol).info
 
         # Get key financial metrics from info
         fundamentals = {
-            'Enterprise Value': ticker.info.get('enterpriseValue'),
-            'EBITDA': ticker.info.get('ebitda'),
-            'Revenue': ticker.info.get('totalRevenue'),
-            'Gross Profits': ticker.info.get('grossProfits'),
-            'Total Cash': ticker.info.get('totalCash'),
-            'Total Debt': ticker.info.get('totalDebt'),
-            'Market Cap': ticker.info.get('marketCap'),
-            'PE Ratio': ticker.info.get('forwardPE'),
-            'Book Value': ticker.info.get('bookValue'),
-            'Free Cash Flow': ticker.info.get('freeCashflow')
+            'Enterprise Value': info.get('enterpriseValue'),
+            'EBITDA': info.get('ebitda'),
+            'Revenue': info.get('totalRevenue'),
+            'Gross Profits': info.get('grossProfits'),
+            'Total Cash': info.get('totalCash'),
+            'Total Debt': info.get('totalDebt'),
+            'Market Cap': info.get('marketCap'),
+            'PE Ratio': info.get('forwardPE'),
+            'Book Value': info.get('bookValue'),
+            'Free Cash Flow': info.get('freeCashflow')
         }
 
         return fundamentals
@@ -83,118 +228,111 @@ class MarketData:
         Get detailed financial statements including balance sheet, income statement, and cash flow
         Returns a dictionary containing DataFrames of financial statements
         """
-        ticker = yf.Ticker(ticker_symbol)
-
-        financials = {
-            'Balance Sheet': ticker.balance_sheet,
-            'Income Statement': ticker.income_stmt,
-            'Cash Flow': ticker.cash_flow
-        }
-
-        self.fd.update_financial_data(ticker_symbol, financials)
-
-        return financials
+        return self.get_statements(ticker_symbol, 'financials')
 
     def get_quarterly_ratios(self, ticker_symbol):
         """
         Get quarterly financial ratios and metrics
         Returns a DataFrame of quarterly metrics
         """
-        ticker = yf.Ticker(ticker_symbol)
+        financials = self.get_statements(ticker_symbol, 'quarterly')['Quarterly Income Statement']
 
         # Get quarterly financial ratios
         quarterly_data = pd.DataFrame({
-            'Quick Ratio': ticker.quarterly_financials.loc['Quick Ratio'] if 'Quick Ratio' in ticker.quarterly_financials.index else None,
-            'Current Ratio': ticker.quarterly_financials.loc['Current Ratio'] if 'Current Ratio' in ticker.quarterly_financials.index else None,
-            'Debt to Equity': ticker.quarterly_financials.loc['Debt To Equity'] if 'Debt To Equity' in ticker.quarterly_financials.index else None,
-            'Gross Margin': ticker.quarterly_financials.loc['Gross Margin'] if 'Gross Margin' in ticker.quarterly_financials.index else None,
-            'Operating Margin': ticker.quarterly_financials.loc['Operating Margin'] if 'Operating Margin' in ticker.quarterly_financials.index else None
+            'Quick Ratio': financials.loc['Quick Ratio'] if 'Quick Ratio' in financials.index else None,
+            'Current Ratio': financials.loc['Current Ratio'] if 'Current Ratio' in financials.index else None,
+            'Debt to Equity': financials.loc['Debt To Equity'] if 'Debt To Equity' in financials.index else None,
+            'Gross Margin': financials.loc['Gross Margin'] if 'Gross Margin' in financials.index else None,
+            'Operating Margin': financials.loc['Operating Margin'] if 'Operating Margin' in financials.index else None
         })
 
         return quarterly_data
 
     def compare_quarterly_financials(self, ticker_symbol):
         """
-        Compare quarterly financial metrics for the past 8 quarters
-        Returns a DataFrame with quarterly comparisons
+        Compare quarterly financial metrics for the past 20 quarters
+        Returns a dictionary of DataFrames with quarterly comparisons, growth
+        figures comparing each quarter with the one(s) before it
         """
-        # Create a Ticker object
-        ticker = yf.Ticker(ticker_symbol)
+        # Make sure the stored statements, and so their derived metrics, are fresh
+        statements = self.get_statements(ticker_symbol, 'quarterly')
 
-        # Get quarterly financial statements
-        income_stmt = ticker.quarterly_income_stmt
-        balance_sheet = ticker.quarterly_balance_sheet
-        cash_flow = ticker.quarterly_cash_flow
-
-        # Initialize DataFrame with dates from income statement
-        quarters = income_stmt.columns[-20:]  # Get last 8 quarters
-
-        # Create a dictionary to store our metrics
-        quarterly_metrics = {}
-
-        # Income Statement Metrics
-        if not income_stmt.empty:
-            metrics_to_get = [
+        # Metrics to compare, per statement
+        metrics_to_get = {
+            'Quarterly Income Statement': [
                 'Total Revenue',
                 'Gross Profit',
                 'Operating Income',
                 'EBITDA',
                 'Net Income',
-            ]
-
-            for metric in metrics_to_get:
-                if metric in income_stmt.index:
-                    quarterly_metrics[metric] = income_stmt.loc[metric, quarters]
-
-        # Balance Sheet Metrics
-        if not balance_sheet.empty:
-            balance_metrics = [
+            ],
+            'Quarterly Balance Sheet': [
                 'Total Assets',
                 'Total Liabilities',
                 'Total Cash',
                 'Total Debt',
                 'Stockholders Equity'
-            ]
-
-            for metric in balance_metrics:
-                if metric in balance_sheet.index:
-                    quarterly_metrics[metric] = balance_sheet.loc[metric, quarters]
-
-        # Cash Flow Metrics
-        if not cash_flow.empty:
-            cash_metrics = [
+            ],
+            'Quarterly Cash Flow': [
                 'Operating Cash Flow',
                 'Free Cash Flow',
                 'Capital Expenditure'
-            ]
-
-            for metric in cash_metrics:
-                if metric in cash_flow.index:
-                    quarterly_metrics[metric] = cash_flow.loc[metric, quarters]
-
-        # Create DataFrame from our metrics
-        df = pd.DataFrame(quarterly_metrics).T
-
-        # Calculate quarter-over-quarter growth
-        qoq_growth = df.pct_change(axis=1) * 100
-        qoq_growth.columns = [f'QoQ Growth {
-            col:%Y-Q%q}' for col in qoq_growth.columns]
-
-        # Calculate year-over-year growth
-        yoy_growth = df.pct_change(periods=4, axis=1) * 100
-        yoy_growth.columns = [f'YoY Growth {
-            col:%Y-Q%q}' for col in yoy_growth.columns]
+            ],
+        }
 
-        # Format the original values in millions
-        df = df / 1_000_000
-        df.columns = [f'{col:%Y-Q%q}' for col in df.columns]
+        # Values in millions and QoQ / YoY growth are maintained by update_financial_data
+        derived = self.fd.get_derived_metrics(ticker_symbol, list(metrics_to_get))
+        if derived.empty and any(not df.empty for df in statements.values()):
+            # statements stored before derived metrics existed
+            self.fd.rebuild_derived_metrics(ticker_symbol)
+            derived = self.fd.get_derived_metrics(ticker_symbol, list(metrics_to_get))
+
+        wanted = [(statement_type, metric)
+                  for statement_type, metrics in metrics_to_get.items() for metric in metrics]
+        keys = pd.MultiIndex.from_frame(derived[['statement_type', 'metric_name']])
+        derived = derived[keys.isin(wanted)]
+
+        # Latest 20 quarters, latest first
+        quarters = sorted(derived['date'].unique(), reverse=True)[:20]
+        metric_order = list(dict.fromkeys(metric for _, metric in wanted))
+        labels = [f'{ts.year}-Q{ts.quarter}' for ts in pd.to_datetime(quarters)]
+
+        def table(column, prefix=''):
+            df = derived.pivot_table(index='metric_name', columns='date', values=column,
+                                     aggfunc='last', dropna=False)
+            df = df.reindex(index=[m for m in metric_order if m in df.index], columns=quarters)
+            df.index.name = df.columns.name = None
+            df.columns = [prefix + label for label in labels]
+            return df
 
         return {
-            'values': df,
-            'qoq_growth': qoq_growth,
-            'yoy_growth': yoy_growth
+            'values': table('value_mm'),
+            'qoq_growth': table('qoq_growth', 'QoQ Growth '),
+            'yoy_growth': table('yoy_growth', 'YoY Growth ')
         }
 
+    def quarterly_panel(self, tickers, metrics=None, quarters=20, refresh=True):
+        """
+        Load the quarterly statements of many tickers into one FinancialPanel
+        With refresh, stale tickers are fetched concurrently first; tickers
+        that fail to fetch keep whatever is already stored
+        """
+        if refresh:
+            for _ in self.batch.run(lambda ticker_symbol: self.get_statements(ticker_symbol, 'quarterly'), tickers):
+                pass
+        return FinancialPanel.load(self.fd, tickers, metrics, quarters=quarters)
+
+    def quarterly_asof(self, tickers, metrics=None, refresh=True):
+        """
+        FinancialAsOf over the quarterly statements of many tickers, for
+        point-in-time lookups on any number of dates; refresh as in
+        quarterly_panel
+        """
+        if refresh:
+            for _ in self.batch.run(lambda ticker_symbol: self.get_statements(ticker_symbol, 'quarterly'), tickers):
+                pass
+        return FinancialAsOf.load(self.fd, tickers, metrics)
+
     def format_financial_analysis(self, ticker_symbol):
         """
         Format and display the quarterly financial analysis in a readable way
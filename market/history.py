@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+
+import numpy as np
+
+from market.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# column name in frames -> file name / dtype on disk
+COLUMNS = {
+    'Date': ('date', 'datetime64[D]'),
+    'Open': ('open', 'f8'),
+    'High': ('high', 'f8'),
+    'Low': ('low', 'f8'),
+    'Close': ('close', 'f8'),
+    'Volume': ('volume', 'i8'),
+}
+
+# prefix of the per-save column directories under a ticker
+VERSION_PREFIX = 'bars-'
+
+
+def missing_ranges(covered, start, end):
+    """Sub-ranges of [start, end) not inside any covered [start, end) interval"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(covered):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    # ranges without a single business day can't hold bars
+    return [(s, e) for s, e in gaps if np.busday_count(s, e) > 0]
+
+
+def merge_ranges(ranges):
+    """Union of [start, end) intervals as a sorted, non-overlapping list"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class OHLCVView:
+    """
+    Read-only window over one ticker's memory-mapped columns
+
+    Slicing only moves offsets into the mapped files, so many processes can
+    share the same pages; columns hand straight to NumPy or ctx.buffer
+    """
+    def __init__(self, ticker, arrays):
+        self.ticker = ticker
+        self.arrays = arrays
+
+    def __len__(self):
+        return len(self.arrays['Date'])
+
+    def __getitem__(self, column):
+        return self.arrays[column]
+
+    def __contains__(self, column):
+        return column in self.arrays
+
+    @property
+    def dates(self):
+        return self.arrays['Date']
+
+    def slice(self, start=None, end=None):
+        """View of the bars in [start, end)"""
+        dates = self.dates
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date()))
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date()))
+        return OHLCVView(self.ticker, {column: values[lo:hi] for column, values in self.arrays.items()})
+
+    def to_numpy(self, columns=('Open', 'High', 'Low', 'Close'), dtype='f4'):
+        """Interleave columns into an (n, len(columns)) array; this one copies"""
+        return np.column_stack([self.arrays[column] for column in columns]).astype(dtype)
+
+    def buffer(self, ctx, column):
+        """Upload one column to the GPU straight from the mapped pages"""
+        return ctx.buffer(self.arrays[column])
+
+    def to_frame(self):
+        frame = pd.DataFrame({column: np.array(values) for column, values in self.arrays.items()})
+        frame['Date'] = frame['Date'].astype('datetime64[ns]')
+        return frame
+
+
+class PriceHistoryStore:
+    """
+    Local OHLCV history, one directory of column files per ticker
+
+    Each save writes a fixed-dtype .npy array per column into a new
+    directory under the ticker and publishes it by replacing the `current`
+    pointer file, so a reader maps every column from the same save and
+    keeps that snapshot while a writer appends. coverage.json holds the
+    [start, end) date ranges already fetched, and index.json at the root
+    lists every ticker's row count and date span. Requests only go upstream
+    for the parts of a range that are not covered yet.
+    fetch(ticker, start, end) returns a Date-indexed OHLCV frame, end exclusive.
+    """
+    def __init__(self, root, fetch):
+        self.root = root
+        self.fetch = fetch
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+    def lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def path(self, ticker, name):
+        return os.path.join(self.root, ticker, name)
+
+    def coverage(self, ticker):
+        """Fetched [start, end) date ranges for a ticker"""
+        path = self.path(ticker, 'coverage.json')
+        if not os.path.exists(path):
+            return []
+        with open(path) as file:
+            return [(np.datetime64(start), np.datetime64(end)) for start, end in json.load(file)]
+
+    def index(self):
+        """{ticker: {'rows', 'first', 'last'}} for every stored ticker"""
+        path = os.path.join(self.root, 'index.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file:
+            return json.load(file)
+
+    def update_index(self, ticker, dates):
+        with self._index_lock:
+            index = self.index()
+            index[ticker] = {
+                'rows': len(dates),
+                'first': str(dates[0]) if len(dates) else None,
+                'last': str(dates[-1]) if len(dates) else None,
+            }
+            tmp = os.path.join(self.root, 'index.tmp.json')
+            with open(tmp, 'w') as file:
+                json.dump(index, file, indent=1, sort_keys=True)
+            os.replace(tmp, os.path.join(self.root, 'index.json'))
+
+    def version(self, ticker):
+        """Directory under the ticker holding its current columns, None if nothing is stored"""
+        try:
+            with open(self.path(ticker, 'current')) as file:
+                return file.read()
+        except FileNotFoundError:
+            # stores written before versioned saves keep the columns at the top
+            return os.curdir if os.path.exists(self.path(ticker, 'date.npy')) else None
+
+    def load(self, ticker, mmap=False):
+        """All stored columns for a ticker, keyed by frame column name"""
+        mmap_mode = 'r' if mmap else None
+        version = self.version(ticker)
+        while version is not None:
+            try:
+                return {column: np.load(self.path(ticker, os.path.join(version, f'{name}.npy')), mmap_mode=mmap_mode)
+                        for column, (name, _) in COLUMNS.items()}
+            except FileNotFoundError:
+                # a writer published a newer save and removed this one meanwhile
+                current = self.version(ticker)
+                if current == version:
+                    raise
+                version = current
+        return {column: np.empty(0, dtype) for column, (_, dtype) in COLUMNS.items()}
+
+    def view(self, ticker):
+        """Zero-copy, read-only OHLCVView over a ticker's stored bars"""
+        return OHLCVView(ticker, self.load(ticker, mmap=True))
+
+    def save(self, ticker, arrays, coverage):
+        os.makedirs(os.path.join(self.root, ticker), exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=VERSION_PREFIX, dir=os.path.join(self.root, ticker))
+        for column, (name, dtype) in COLUMNS.items():
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(arrays[column], dtype=dtype))
+        # one rename switches every column at once
+        version = os.path.basename(directory)
+        tmp = self.path(ticker, f'current.{version}.tmp')
+        with open(tmp, 'w') as file:
+            file.write(version)
+        os.replace(tmp, self.path(ticker, 'current'))
+        tmp = self.path(ticker, 'coverage.tmp.json')
+        with open(tmp, 'w') as file:
+            json.dump([(str(start), str(end)) for start, end in coverage], file)
+        os.replace(tmp, self.path(ticker, 'coverage.json'))
+        self.update_index(ticker, arrays['Date'])
+        self.prune(ticker, version)
+
+    def prune(self, ticker, version):
+        """
+        Delete the column files older saves left behind; maps already open
+        keep their pages, and a reader that loses the race reloads
+        """
+        legacy = {f'{name}.npy' for name, _ in COLUMNS.values()}
+        for entry in os.scandir(os.path.join(self.root, ticker)):
+            if entry.name.startswith(VERSION_PREFIX) and entry.name != version:
+                # a platform that can't delete mapped files retries on the next save
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name in legacy:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def frame_to_arrays(df):
+        dates = pd.DatetimeIndex(df.index)
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        arrays = {'Date': dates.values.astype('datetime64[D]')}
+        for column, (_, dtype) in COLUMNS.items():
+            if column != 'Date':
+                values = df[column].to_numpy(dtype='f8')
+                arrays[column] = np.nan_to_num(values).astype(dtype) if dtype == 'i8' else values
+        return arrays
+
+    def update(self, ticker, start, end):
+        """Fetch the uncovered parts of [start, end); returns the number of new bars"""
+        start = np.datetime64(pd.Timestamp(start).date())
+        # days after today can't be covered yet
+        end = min(np.datetime64(pd.Timestamp(end).date()), np.datetime64(date.today()))
+        with self.lock(ticker):
+            coverage = self.coverage(ticker)
+            gaps = missing_ranges(coverage, start, end)
+            if not gaps:
+                return 0
+
+            parts = [self.load(ticker)]
+            covered, empty = [], []
+            for gap_start, gap_end in gaps:
+                fetched = self.fetch(ticker, str(gap_start), str(gap_end))
+                if fetched is not None and len(fetched):
+                    parts.append(self.frame_to_arrays(fetched))
+                    covered.append((gap_start, gap_end))
+                else:
+                    empty.append((gap_start, gap_end))
+            n_before = len(parts[0]['Date'])
+
+            merged = {column: np.concatenate([part[column] for part in parts]) for column in COLUMNS}
+            # later fetches win on overlapping days
+            _, last = np.unique(merged['Date'][::-1], return_index=True)
+            keep = len(merged['Date']) - 1 - last
+            merged = {column: values[keep] for column, values in merged.items()}
+
+            # yf.download answers errors with an empty frame too, so an empty
+            # range only counts as covered when bars after it prove it has none
+            if len(merged['Date']):
+                last_bar = merged['Date'].max()
+                covered += [(gap_start, gap_end) for gap_start, gap_end in empty if gap_end <= last_bar]
+            if not covered:
+                return 0
+            self.save(ticker, merged, merge_ranges(coverage + covered))
+            return len(merged['Date']) - n_before
+
+    def read(self, ticker, start=None, end=None):
+        """Stored bars in [start, end) as a frame, without going upstream"""
+        # only the requested window is paged in and copied
+        return self.view(ticker).slice(start, end).to_frame()
+
+    def get(self, ticker, start, end):
+        """Bars in [start, end), fetching only what is not stored yet"""
+        self.update(ticker, start, end)
+        return self.read(ticker, start, end)
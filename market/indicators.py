@@ -0,0 +1,362 @@
+import contextlib
+import json
+import os
+
+import numpy as np
+
+from market.history import OHLCVView
+
+
+def rolling_sum(values, tail, window):
+    """
+    Sum of the window bars ending at each value, continuing from tail
+
+    tail holds the window - 1 values that came before; returns the sums
+    (nan until a full window has been seen) and the tail for the next call.
+    Works along the last axis, so stacked rows are summed at once
+    """
+    x = np.concatenate([tail, values], axis=-1)
+    # summing relative to the first value keeps the cumsum small
+    origin = x[..., :1] if x.shape[-1] else 0.0
+    totals = np.concatenate([np.zeros(x.shape[:-1] + (1,)), np.cumsum(x - origin, axis=-1)], axis=-1)
+    ends = np.arange(tail.shape[-1], x.shape[-1]) + 1
+    sums = np.full(values.shape, np.nan)
+    full = ends >= window
+    sums[..., full] = totals[..., ends[full]] - totals[..., ends[full] - window] + window * origin
+    return sums, x[..., x.shape[-1] - (window - 1):] if window > 1 else x[..., :0]
+
+
+def ewm(values, alpha, prev=np.nan):
+    """
+    y[i] = alpha * x[i] + (1 - alpha) * y[i - 1] in closed form, blockwise
+    along the last axis
+
+    y[-1] is prev, one per row; a row without one is seeded with its first
+    value, like pandas ewm(adjust=False)
+    """
+    out = np.empty(values.shape)
+    if not values.shape[-1]:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[...] = values
+        return out
+    prev = np.asarray(prev, dtype='f8')
+    out[..., 0] = np.where(np.isnan(prev), values[..., 0], decay * prev + alpha * values[..., 0])
+    prev = out[..., 0]
+    # decay ** -block must stay far from overflow
+    block = max(1, int(150 / -np.log10(decay)))
+    for lo in range(1, values.shape[-1], block):
+        x = values[..., lo:lo + block]
+        powers = decay ** np.arange(x.shape[-1])
+        y = powers * (decay * prev[..., None] + alpha * np.cumsum(x / powers, axis=-1))
+        out[..., lo:lo + x.shape[-1]] = y
+        prev = y[..., -1]
+    return out
+
+
+class SMA:
+    """Simple moving average of closes"""
+    def __init__(self, window=20):
+        self.window = window
+        self.key = f'sma_{window}'
+        self.columns = {f'SMA {window}': self.key}
+
+    def initial_state(self):
+        return {'tail': np.empty(0)}
+
+    def update(self, bars, state):
+        sums, state['tail'] = rolling_sum(bars['Close'], state['tail'], self.window)
+        return {f'SMA {self.window}': sums / self.window}
+
+
+class EMA:
+    """Exponential moving average of closes, seeded with the first close"""
+    def __init__(self, span=20):
+        self.span = span
+        self.key = f'ema_{span}'
+        self.columns = {f'EMA {span}': self.key}
+
+    def initial_state(self):
+        return {'last': np.nan}
+
+    def update(self, bars, state):
+        values = ewm(bars['Close'], 2 / (self.span + 1), state['last'])
+        if values.shape[-1]:
+            state['last'] = values[..., -1]
+        return {f'EMA {self.span}': values}
+
+
+class RSI:
+    """Wilder relative strength index; nan until window price changes are seen"""
+    def __init__(self, window=14):
+        self.window = window
+        self.key = f'rsi_{window}'
+        self.columns = {f'RSI {window}': self.key}
+
+    def initial_state(self):
+        return {'close': np.nan, 'gain': np.nan, 'loss': np.nan, 'seen': 0}
+
+    def update(self, bars, state):
+        close = bars['Close']
+        rsi = np.full(close.shape, np.nan)
+        if not close.shape[-1]:
+            return {f'RSI {self.window}': rsi}
+        prev_close = np.asarray(state['close'], dtype='f8')
+        # the first bar ever has no change to measure; stacked rows agree on it
+        first = 1 if np.isnan(prev_close).any() else 0
+        change = np.diff(np.concatenate([prev_close[..., None], close], axis=-1), axis=-1)[..., first:]
+        gain = ewm(np.maximum(change, 0), 1 / self.window, state['gain'])
+        loss = ewm(np.maximum(-change, 0), 1 / self.window, state['loss'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+        seen = np.asarray(state['seen'])[..., None] + np.arange(1, change.shape[-1] + 1)
+        rsi[..., first:] = np.where(seen >= self.window, values, np.nan)
+        if change.shape[-1]:
+            state['gain'], state['loss'], state['seen'] = gain[..., -1], loss[..., -1], seen[..., -1]
+        state['close'] = close[..., -1]
+        return {f'RSI {self.window}': rsi}
+
+
+class Bollinger:
+    """Moving average of closes with bands num_std population deviations away"""
+    def __init__(self, window=20, num_std=2.0):
+        self.window = window
+        self.num_std = num_std
+        self.key = f'bb_{window}_{num_std:g}'
+        self.names = {part: f'BB {window} {part}' for part in ('Mid', 'Upper', 'Lower')}
+        self.columns = {name: f'{self.key}_{part.lower()}' for part, name in self.names.items()}
+
+    def initial_state(self):
+        return {'tail': np.empty(0), 'tail_sq': np.empty(0)}
+
+    def update(self, bars, state):
+        close = bars['Close']
+        sums, state['tail'] = rolling_sum(close, state['tail'], self.window)
+        sums_sq, state['tail_sq'] = rolling_sum(close * close, state['tail_sq'], self.window)
+        mid = sums / self.window
+        std = np.sqrt(np.maximum(sums_sq / self.window - mid * mid, 0))
+        return {
+            self.names['Mid']: mid,
+            self.names['Upper']: mid + self.num_std * std,
+            self.names['Lower']: mid - self.num_std * std,
+        }
+
+
+class ATR:
+    """Wilder average true range; nan until window bars are seen"""
+    def __init__(self, window=14):
+        self.window = window
+        self.key = f'atr_{window}'
+        self.columns = {f'ATR {window}': self.key}
+
+    def initial_state(self):
+        return {'close': np.nan, 'last': np.nan, 'seen': 0}
+
+    def update(self, bars, state):
+        high, low, close = bars['High'], bars['Low'], bars['Close']
+        if not close.shape[-1]:
+            return {f'ATR {self.window}': np.empty(close.shape)}
+        prev_close = np.concatenate([np.asarray(state['close'], dtype='f8')[..., None], close[..., :-1]], axis=-1)
+        # without a previous close the range is just high - low
+        prev_close[..., 0] = np.where(np.isnan(prev_close[..., 0]), close[..., 0], prev_close[..., 0])
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        atr = ewm(true_range, 1 / self.window, state['last'])
+        seen = np.asarray(state['seen'])[..., None] + np.arange(1, close.shape[-1] + 1)
+        state['close'], state['last'], state['seen'] = close[..., -1], atr[..., -1], seen[..., -1]
+        return {f'ATR {self.window}': np.where(seen >= self.window, atr, np.nan)}
+
+
+class VWAP:
+    """Volume-weighted typical price, from the first bar or over a rolling window"""
+    def __init__(self, window=None):
+        self.window = window
+        self.key = 'vwap' if window is None else f'vwap_{window}'
+        self.name = 'VWAP' if window is None else f'VWAP {window}'
+        self.columns = {self.name: self.key}
+
+    def initial_state(self):
+        if self.window is None:
+            return {'pv': 0.0, 'volume': 0.0}
+        return {'pv': np.empty(0), 'volume': np.empty(0)}
+
+    def update(self, bars, state):
+        volume = np.asarray(bars['Volume'], dtype='f8')
+        pv = (bars['High'] + bars['Low'] + bars['Close']) / 3 * volume
+        if self.window is None:
+            pv = np.asarray(state['pv'])[..., None] + np.cumsum(pv, axis=-1)
+            volume = np.asarray(state['volume'])[..., None] + np.cumsum(volume, axis=-1)
+            if pv.shape[-1]:
+                state['pv'], state['volume'] = pv[..., -1], volume[..., -1]
+        else:
+            pv, state['pv'] = rolling_sum(pv, state['pv'], self.window)
+            volume, state['volume'] = rolling_sum(volume, state['volume'], self.window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {self.name: np.where(volume > 0, pv / volume, np.nan)}
+
+
+DEFAULT_INDICATORS = (SMA(20), SMA(50), EMA(12), EMA(26), RSI(14), Bollinger(20, 2), ATR(14), VWAP())
+
+# the bar columns indicators read
+BAR_COLUMNS = ('High', 'Low', 'Close', 'Volume')
+
+
+class IndicatorEngine:
+    """
+    Vectorized technical indicators that can be continued bar by bar
+
+    run(bars) computes every indicator over a whole series in one pass and
+    returns the states reached; run(new_bars, states) picks up from there,
+    so appending bars costs O(new bars) and matches a full recompute.
+    run_many does the same for many tickers, stacking them into 2-D arrays
+    so each indicator runs once across a batch rather than once per ticker.
+    """
+    def __init__(self, indicators=None):
+        self.indicators = list(DEFAULT_INDICATORS if indicators is None else indicators)
+
+    @property
+    def columns(self):
+        """{output column: file stem} over all indicators"""
+        return {name: stem for indicator in self.indicators for name, stem in indicator.columns.items()}
+
+    def initial_states(self):
+        return {indicator.key: indicator.initial_state() for indicator in self.indicators}
+
+    def run(self, bars, states=None):
+        """({column: values aligned with bars}, states) continuing from states"""
+        states = self.initial_states() if states is None else states
+        bars = {column: np.asarray(bars[column], dtype='f8') for column in BAR_COLUMNS}
+        results = {}
+        for indicator in self.indicators:
+            results.update(indicator.update(bars, states[indicator.key]))
+        return results, states
+
+    def run_many(self, bars_by_ticker, states=None):
+        """
+        run over {ticker: bars}; returns ({ticker: results}, {ticker: states})
+
+        Tickers with as many bars and states of the same shape (aligned
+        histories, or one new bar each) are stacked row per ticker and go
+        through every indicator together
+        """
+        states = states or {}
+        batches = {}
+        for ticker, bars in bars_by_ticker.items():
+            bars = {column: np.asarray(bars[column], dtype='f8') for column in BAR_COLUMNS}
+            state = states.get(ticker) or self.initial_states()
+            # an unseeded scalar (no close seen yet) starts differently, so it splits batches too
+            key = (len(bars['Close']), tuple(
+                (np.shape(value), bool(np.ndim(value) == 0 and np.isnan(value)))
+                for indicator_state in state.values() for value in indicator_state.values()))
+            batches.setdefault(key, []).append((ticker, bars, state))
+        results = {}
+        for batch in batches.values():
+            bars = {column: np.stack([row[column] for _, row, _ in batch]) for column in BAR_COLUMNS}
+            stacked = {key: {name: np.stack([np.asarray(state[key][name]) for _, _, state in batch])
+                             for name in indicator_state}
+                       for key, indicator_state in batch[0][2].items()}
+            batch_results = {}
+            for indicator in self.indicators:
+                batch_results.update(indicator.update(bars, stacked[indicator.key]))
+            for i, (ticker, _, _) in enumerate(batch):
+                results[ticker] = {name: values[i] for name, values in batch_results.items()}
+                states[ticker] = {key: {name: value[i] for name, value in indicator_state.items()}
+                                  for key, indicator_state in stacked.items()}
+        return results, states
+
+
+class IndicatorStore:
+    """
+    Indicator columns cached next to a PriceHistoryStore ticker's bars
+
+    <ticker>/indicators holds one .npy per output column plus the engine
+    state after the last stored bar. When the history only grew at the end,
+    get() runs the engine over the new bars; anything else (a backfill, a
+    different indicator set) recomputes the whole series.
+    """
+    def __init__(self, history, engine=None):
+        self.history = history
+        self.engine = engine if engine is not None else IndicatorEngine()
+
+    def path(self, ticker, name):
+        return self.history.path(ticker, os.path.join('indicators', name))
+
+    def load_cached(self, ticker, view):
+        """(results, states, rows) still valid for view, or None"""
+        path = self.path(ticker, 'indicators.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            meta = json.load(file)
+        rows = meta['rows']
+        if (meta['keys'] != [indicator.key for indicator in self.engine.indicators]
+                or rows > len(view) or not rows
+                or str(view.dates[0]) != meta['first'] or str(view.dates[rows - 1]) != meta['last']):
+            return None
+        results = {name: np.load(self.path(ticker, f'{stem}.npy'), mmap_mode='r')
+                   for name, stem in self.engine.columns.items()}
+        with np.load(self.path(ticker, 'state.npz')) as saved:
+            states = self.engine.initial_states()
+            for field, value in saved.items():
+                key, name = field.split('/')
+                states[key][name] = value
+        return results, states, rows
+
+    def save(self, ticker, view, results, states):
+        os.makedirs(self.path(ticker, ''), exist_ok=True)
+        for name, stem in self.engine.columns.items():
+            tmp = self.path(ticker, f'{stem}.tmp.npy')
+            np.save(tmp, np.ascontiguousarray(results[name], dtype='f8'))
+            os.replace(tmp, self.path(ticker, f'{stem}.npy'))
+        tmp = self.path(ticker, 'state.tmp.npz')
+        np.savez(tmp, **{f'{key}/{name}': value for key, state in states.items() for name, value in state.items()})
+        os.replace(tmp, self.path(ticker, 'state.npz'))
+        # written last, so it never describes columns that are not on disk yet
+        meta = {
+            'keys': [indicator.key for indicator in self.engine.indicators],
+            'rows': len(view),
+            'first': str(view.dates[0]),
+            'last': str(view.dates[-1]),
+        }
+        tmp = self.path(ticker, 'indicators.tmp.json')
+        with open(tmp, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmp, self.path(ticker, 'indicators.json'))
+
+    def get(self, ticker):
+        """OHLCVView of the stored bars with every indicator column added"""
+        return self.get_many([ticker])[ticker]
+
+    def get_many(self, tickers):
+        """
+        {ticker: get(ticker)}; the bars still to compute for every ticker go
+        through one engine.run_many, so they are batched across tickers
+        """
+        tickers = list(dict.fromkeys(tickers))
+        with contextlib.ExitStack() as stack:
+            # always taken in the same order, so concurrent calls cannot deadlock
+            for ticker in sorted(tickers):
+                stack.enter_context(self.history.lock(ticker))
+            views = {ticker: self.history.view(ticker) for ticker in tickers}
+            cached, pending, states = {}, {}, {}
+            for ticker, view in views.items():
+                cached[ticker] = self.load_cached(ticker, view) if len(view) else None
+                if cached[ticker] is None:
+                    pending[ticker] = view.arrays
+                elif cached[ticker][2] < len(view):
+                    _, states[ticker], rows = cached[ticker]
+                    pending[ticker] = {column: values[rows:] for column, values in view.arrays.items()}
+            new_results, states = self.engine.run_many(pending, states)
+            views_with_indicators = {}
+            for ticker, view in views.items():
+                if cached[ticker] is None:
+                    results = new_results[ticker]
+                else:
+                    results = cached[ticker][0]
+                    if ticker in new_results:
+                        results = {name: np.concatenate([results[name], new_results[ticker][name]])
+                                   for name in results}
+                if ticker in new_results and len(view):
+                    self.save(ticker, view, results, states[ticker])
+                views_with_indicators[ticker] = OHLCVView(ticker, {**view.arrays, **results})
+            return views_with_indicators
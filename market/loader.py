@@ -0,0 +1,92 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# a finished request: exactly one of value / error is set
+LoadResult = namedtuple('LoadResult', ['request_id', 'name', 'value', 'error'])
+
+
+class AsyncMarketLoader:
+    """
+    Run MarketData calls off the render thread
+
+    submit() queues a call for a few daemon worker threads and returns
+    immediately, so a slow network never holds up a frame, and close()
+    waits at most a timeout for calls in flight.
+    Workers append finished calls to a back buffer; poll(), called once per
+    frame from the render thread, swaps it with the front buffer under a
+    lock held for just the swap, runs callbacks and returns the results.
+    """
+    def __init__(self, market_data, max_workers=2):
+        self.md = market_data
+        self.requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._back = []
+        self._front = []
+        self._callbacks = {}
+        self._next_id = 0
+        self.pending = 0
+        self.workers = [threading.Thread(target=self._work, name=f'market-{i}', daemon=True)
+                        for i in range(max_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, name, *args, callback=None, **kwargs):
+        """Queue md.<name>(*args, **kwargs); callback(result) runs in poll()"""
+        request_id = self._next_id
+        self._next_id += 1
+        if callback is not None:
+            self._callbacks[request_id] = callback
+        self.pending += 1
+        self.requests.put((request_id, name, args, kwargs))
+        return request_id
+
+    def _work(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            request_id, name, args, kwargs = request
+            try:
+                result = LoadResult(request_id, name, getattr(self.md, name)(*args, **kwargs), None)
+            except Exception as error:
+                result = LoadResult(request_id, name, None, error)
+            with self._lock:
+                self._back.append(result)
+
+    def poll(self):
+        """Results finished since the last poll, callbacks already run"""
+        with self._lock:
+            self._front, self._back = self._back, self._front
+        results, self._front = self._front, []
+        self.pending -= len(results)
+        for result in results:
+            callback = self._callbacks.pop(result.request_id, None)
+            if callback is not None:
+                callback(result)
+        return results
+
+    def close(self, timeout=5.0):
+        """
+        Drop the queued calls and wait up to timeout seconds for the ones
+        already running, so md can be closed after this returns True
+        Returns whether every worker stopped
+        """
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            # a stop sentinel from an earlier close(), queued again below
+            if request is None:
+                continue
+            self.pending -= 1
+            self._callbacks.pop(request[0], None)
+        for worker in self.workers:
+            if worker.is_alive():
+                self.requests.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        return not any(worker.is_alive() for worker in self.workers)
@@ -0,0 +1,215 @@
+import numpy as np
+
+from market.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# statements the quarterly panel is built from, as stored by MarketData
+QUARTERLY_STATEMENT_TYPES = (
+    'Quarterly Income Statement',
+    'Quarterly Balance Sheet',
+    'Quarterly Cash Flow',
+)
+
+# days since the epoch fit well below this, so (ticker, day) packs into one int
+DAY_SPAN = 1 << 20
+
+
+def statement_precedence(row_statements, statement_types=None):
+    """
+    Rank of each row's statement type when several report the same metric
+    and period, 0 winning: the order of statement_types, or name order
+    """
+    if statement_types is None:
+        return pd.factorize(np.asarray(row_statements, dtype=object), sort=True)[0]
+    return pd.Index(list(dict.fromkeys(statement_types))).get_indexer(row_statements)
+
+
+def pct_change(values, periods):
+    """Percent change along the last (chronological) axis, NaN where undefined"""
+    change = np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change[..., periods:] = (values[..., periods:] / values[..., :-periods] - 1) * 100
+    return change
+
+
+class FinancialPanel:
+    """
+    Dense tickers x metrics x quarters block of financial values
+
+    Quarters are aligned per ticker by position, oldest first and the latest
+    reported period last, since fiscal calendars differ between companies;
+    period_end holds each ticker's actual period-end dates (NaT when a ticker
+    has fewer quarters). Missing values are NaN and `mask` marks present ones.
+    """
+    def __init__(self, tickers, metrics, values, period_end):
+        self.tickers = list(tickers)
+        self.metrics = list(metrics)
+        self.values = values
+        self.period_end = period_end
+        self.mask = ~np.isnan(values)
+        self._metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+    @classmethod
+    def load(cls, fd, tickers, metrics=None, statement_types=QUARTERLY_STATEMENT_TYPES, quarters=20):
+        """Build a panel of the latest `quarters` periods straight from FinancialDatabase rows"""
+        rows = fd.get_financial_rows(tickers, statement_types, metrics)
+        tickers = list(dict.fromkeys(tickers))
+        if not rows:
+            metrics = list(metrics or [])
+            return cls(tickers, metrics,
+                       np.full((len(tickers), len(metrics), quarters), np.nan),
+                       np.full((len(tickers), quarters), np.datetime64('NaT'), dtype='datetime64[D]'))
+
+        row_tickers, row_statements, row_metrics, row_dates, row_values = zip(*rows)
+        ticker_codes = pd.Index(tickers).get_indexer(row_tickers)
+        metric_codes, metric_axis = pd.factorize(np.asarray(row_metrics, dtype=object))
+        if metrics is not None:
+            metric_axis = pd.Index(list(dict.fromkeys(metrics)))
+            metric_codes = metric_axis.get_indexer(row_metrics)
+        days = np.asarray(row_dates, dtype='datetime64[D]').astype('i8')
+        values = np.asarray(row_values, dtype='f8')
+
+        # rank every (ticker, period) from the latest backwards
+        pairs, pair_of_row = np.unique(ticker_codes * DAY_SPAN + days, return_inverse=True)
+        pair_ticker = pairs // DAY_SPAN
+        group_end = np.cumsum(np.bincount(pair_ticker, minlength=len(tickers)))
+        from_latest = group_end[pair_ticker] - np.arange(len(pairs)) - 1
+        column = quarters - 1 - from_latest
+
+        panel_values = np.full((len(tickers), len(metric_axis), quarters), np.nan)
+        period_end = np.full((len(tickers), quarters), np.datetime64('NaT'), dtype='datetime64[D]')
+        keep_pair = column >= 0
+        period_end[pair_ticker[keep_pair], column[keep_pair]] = (pairs[keep_pair] % DAY_SPAN).astype('datetime64[D]')
+
+        row_column = column[pair_of_row]
+        keep = np.flatnonzero(row_column >= 0)
+        # one row per cell: a known value over NaN, then as FinancialAsOf.from_rows
+        # does, the first statement type
+        cell = (ticker_codes[keep] * len(metric_axis) + metric_codes[keep]) * quarters + row_column[keep]
+        order = np.lexsort((statement_precedence(row_statements, statement_types)[keep],
+                            np.isnan(values[keep]), cell))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cell[order[1:]] != cell[order[:-1]]
+        winners = keep[order[first]]
+        panel_values.reshape(-1)[cell[order[first]]] = values[winners]
+        return cls(tickers, metric_axis, panel_values, period_end)
+
+    def metric(self, name):
+        """tickers x quarters values of one metric, all NaN if never reported"""
+        i = self._metric_index.get(name)
+        if i is None:
+            return np.full(self.period_end.shape, np.nan)
+        return self.values[:, i, :]
+
+    def qoq_growth(self):
+        """Quarter-over-quarter growth (%) of every metric"""
+        return pct_change(self.values, 1)
+
+    def yoy_growth(self):
+        """Year-over-year growth (%) of every metric"""
+        return pct_change(self.values, 4)
+
+    def ratio(self, numerator, denominator):
+        """tickers x quarters ratio of two metrics"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.metric(numerator) / self.metric(denominator)
+
+    def margin(self, metric, revenue='Total Revenue'):
+        """tickers x quarters margin (%) of a metric over revenue"""
+        return self.ratio(metric, revenue) * 100
+
+    def latest(self, values):
+        """Last quarter of a tickers x [metrics x] quarters array"""
+        return values[..., -1]
+
+    def to_frame(self, values, columns=None):
+        """Index a 2-D tickers x (quarters | metrics) result by ticker"""
+        return pd.DataFrame(values, index=pd.Index(self.tickers, name='ticker'), columns=columns)
+
+
+class FinancialAsOf:
+    """
+    Latest known value of every (ticker, metric) as of any date
+
+    Rows are kept sorted by (ticker, metric, period end) with the next period
+    end of the same cell alongside, so each row is the answer on
+    [period end, next period end). at() places every row onto the dates
+    asked for with two searchsorted calls and one scatter, whatever the
+    number of tickers or dates. Dates are statement period ends; NULL
+    values are not known values, so an earlier period shows through.
+    """
+    def __init__(self, tickers, metrics, cells, days, values):
+        self.tickers = list(tickers)
+        self.metrics = list(metrics)
+        self.cells = cells
+        self.days = days
+        self.values = values
+        # a cell's next period end, or never for its latest row
+        self.next_days = np.full(len(days), np.iinfo('i8').max)
+        same_cell = cells[1:] == cells[:-1]
+        self.next_days[:-1][same_cell] = days[1:][same_cell]
+
+    @classmethod
+    def load(cls, fd, tickers=None, metrics=None, statement_types=QUARTERLY_STATEMENT_TYPES, end_date=None):
+        """
+        Read the rows of tickers (all when None) up to end_date from
+        FinancialDatabase in one query; metrics default to all reported
+        A metric found in several statement types for the same period takes
+        the first statement type's value (by name when statement_types is None)
+        """
+        return cls.from_rows(fd.get_financial_rows(tickers, statement_types, metrics, end_date),
+                             tickers, metrics, statement_types)
+
+    @classmethod
+    def from_rows(cls, rows, tickers=None, metrics=None, statement_types=None):
+        """Build from FinancialDatabase.get_financial_rows rows, axes as in load"""
+        row_tickers, row_statements, row_metrics, row_dates, row_values = zip(*rows) if rows else ((),) * 5
+        if tickers is None:
+            ticker_codes, ticker_axis = pd.factorize(np.asarray(row_tickers, dtype=object), sort=True)
+        else:
+            ticker_axis = pd.Index(list(dict.fromkeys(tickers)))
+            ticker_codes = ticker_axis.get_indexer(row_tickers)
+        if metrics is None:
+            metric_codes, metric_axis = pd.factorize(np.asarray(row_metrics, dtype=object), sort=True)
+        else:
+            metric_axis = pd.Index(list(dict.fromkeys(metrics)))
+            metric_codes = metric_axis.get_indexer(row_metrics)
+        days = np.asarray(row_dates, dtype='datetime64[D]').astype('i8')
+        values = np.asarray(row_values, dtype='f8')
+
+        statement_codes = statement_precedence(row_statements, statement_types)
+
+        known = ~np.isnan(values)
+        cells = (ticker_codes * len(metric_axis) + metric_codes)[known]
+        days, values = days[known], values[known]
+        # within a cell and period the last row wins: make that the first statement type
+        order = np.lexsort((-statement_codes[known], days, cells))
+        return cls(ticker_axis, metric_axis, cells[order], days[order], values[order])
+
+    def at(self, dates):
+        """
+        tickers x metrics values as of a date, or dates x tickers x metrics
+        for a sequence of dates; NaN where nothing was reported yet
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        days = np.atleast_1d(dates).astype('i8')
+        order = np.argsort(days, kind='stable')
+        sorted_days = days[order]
+
+        # the dates each row answers, as a range of positions in sorted_days
+        lo = np.searchsorted(sorted_days, self.days)
+        counts = np.searchsorted(sorted_days, self.next_days) - lo
+        rows = np.repeat(np.arange(len(counts)), counts)
+        starts = np.cumsum(counts) - counts
+        positions = np.arange(len(rows)) - starts[rows] + lo[rows]
+
+        out = np.full((len(days), len(self.tickers) * len(self.metrics)), np.nan)
+        out[order[positions], self.cells[rows]] = self.values[rows]
+        out = out.reshape(len(days), len(self.tickers), len(self.metrics))
+        return out[0] if dates.ndim == 0 else out
+
+    def frame(self, date):
+        """DataFrame of at(date) indexed by ticker, one column per metric"""
+        return pd.DataFrame(self.at(date), index=pd.Index(self.tickers, name='ticker'),
+                            columns=pd.Index(self.metrics))
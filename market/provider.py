@@ -0,0 +1,164 @@
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from market.lazy import lazy_import
+
+pd = lazy_import('pandas')
+yf = lazy_import('yfinance')
+
+# Ticker attributes a provider can serve as statements
+STATEMENT_ATTRIBUTES = (
+    'balance_sheet', 'income_stmt', 'cash_flow',
+    'quarterly_balance_sheet', 'quarterly_income_stmt', 'quarterly_cash_flow',
+)
+
+# metrics the synthetic provider fills in, per statement
+SYNTHETIC_METRICS = {
+    'balance_sheet': ['Total Assets', 'Total Liabilities Net Minority Interest', 'Total Debt',
+                      'Cash And Cash Equivalents', 'Stockholders Equity'],
+    'income_stmt': ['Total Revenue', 'Gross Profit', 'Operating Income', 'EBITDA', 'Net Income'],
+    'cash_flow': ['Operating Cash Flow', 'Free Cash Flow', 'Capital Expenditure'],
+}
+
+SYNTHETIC_INFO = {
+    'enterpriseValue': 2.0e12, 'ebitda': 1.3e11, 'totalRevenue': 3.8e11, 'grossProfits': 1.7e11,
+    'totalCash': 6.5e10, 'totalDebt': 1.1e11, 'marketCap': 2.9e12, 'forwardPE': 28.0,
+    'bookValue': 4.4, 'freeCashflow': 1.0e11,
+}
+
+
+class MarketDataProvider:
+    """
+    Source of price history, ticker info and financial statements
+
+    get_history returns a Date-indexed frame with Open, High, Low, Close,
+    Volume columns; get_statement returns metrics x period-end dates with
+    the latest period first, the way yfinance does
+    """
+    def get_history(self, ticker, start, end): ...
+
+    def get_info(self, ticker): ...
+
+    def get_statement(self, ticker, attribute): ...
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance"""
+    def get_history(self, ticker, start, end):
+        data = yf.download(ticker, start, end, progress=False)
+        # single-ticker downloads come back with a (Price, Ticker) column index
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        return data
+
+    def get_info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def get_statement(self, ticker, attribute):
+        return getattr(yf.Ticker(ticker), attribute)
+
+
+class LocalProvider(MarketDataProvider):
+    """
+    Recorded or synthetic data served from disk, no network
+
+    Files live under root/<TICKER>/: history.csv, info.json and one
+    <attribute>.csv per statement. With synthetic=True anything missing is
+    generated deterministically from the ticker name. latency seconds are
+    slept on every call to mimic a remote source.
+    """
+    def __init__(self, root=None, synthetic=True, latency=0.0):
+        self.root = root
+        self.synthetic = synthetic
+        self.latency = latency
+
+    def path(self, ticker, name):
+        return os.path.join(self.root, ticker, name) if self.root else None
+
+    def _load(self, ticker, name, read, generate):
+        if self.latency:
+            time.sleep(self.latency)
+        path = self.path(ticker, name)
+        if path and os.path.exists(path):
+            return read(path)
+        if self.synthetic:
+            return generate()
+        raise FileNotFoundError(f'no recorded {name} for {ticker}')
+
+    @staticmethod
+    def _rng(ticker, salt=''):
+        return np.random.default_rng(zlib.crc32(f'{ticker}:{salt}'.encode()))
+
+    def get_history(self, ticker, start, end):
+        def read(path):
+            data = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+            return data.loc[pd.Timestamp(start):pd.Timestamp(end) - pd.Timedelta(days=1)]
+        return self._load(ticker, 'history.csv', read,
+                          lambda: self.synthetic_history(ticker, start, end))
+
+    def get_info(self, ticker):
+        def read(path):
+            with open(path) as file:
+                return json.load(file)
+        return self._load(ticker, 'info.json', read, lambda: self.synthetic_info(ticker))
+
+    def get_statement(self, ticker, attribute):
+        def read(path):
+            df = pd.read_csv(path, index_col=0)
+            df.columns = pd.to_datetime(df.columns)
+            return df
+        return self._load(ticker, f'{attribute}.csv', read,
+                          lambda: self.synthetic_statement(ticker, attribute))
+
+    def synthetic_history(self, ticker, start, end):
+        """Business-day random walk, stable for a given ticker"""
+        # yf.download treats end as exclusive
+        dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name='Date')
+        # walk from a fixed epoch so overlapping ranges agree on shared days
+        epoch = np.datetime64('1970-01-01')
+        offsets = np.busday_count(epoch, dates.values.astype('datetime64[D]'))
+        n_days = int(offsets[-1]) + 1 if len(offsets) else 0
+
+        close = 20.0 * np.exp(np.cumsum(self._rng(ticker, 'close').normal(0.0001, 0.015, n_days)))
+        spread = np.abs(self._rng(ticker, 'spread').normal(0, 0.01, n_days)) * close
+        open_ = close * (1 + self._rng(ticker, 'open').normal(0, 0.005, n_days))
+        volume = self._rng(ticker, 'volume').integers(1_000_000, 50_000_000, n_days)
+        close, spread, open_, volume = (series[offsets] for series in (close, spread, open_, volume))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': volume,
+        }, index=dates)
+
+    def synthetic_info(self, ticker):
+        scale = self._rng(ticker, 'info').uniform(0.01, 1.0)
+        return {key: value * scale if key != 'forwardPE' else value
+                for key, value in SYNTHETIC_INFO.items()}
+
+    def synthetic_statement(self, ticker, attribute):
+        quarterly = attribute.startswith('quarterly_')
+        metrics = SYNTHETIC_METRICS[attribute.removeprefix('quarterly_')]
+        dates = pd.date_range(end='2024-12-31', periods=8 if quarterly else 4,
+                              freq='QE' if quarterly else 'YE')[::-1]
+        rng = self._rng(ticker, attribute)
+        base = rng.uniform(1e9, 1e11, (len(metrics), 1))
+        growth = np.cumprod(rng.normal(1.02, 0.05, (len(metrics), len(dates))), axis=1)
+        return pd.DataFrame(base * growth[:, ::-1], index=metrics, columns=dates)
+
+    def record(self, source, ticker, start, end, attributes=STATEMENT_ATTRIBUTES):
+        """Copy a ticker's data from another provider into root"""
+        os.makedirs(os.path.join(self.root, ticker), exist_ok=True)
+        source.get_history(ticker, start, end).to_csv(self.path(ticker, 'history.csv'),
+                                                      index_label='Date')
+        with open(self.path(ticker, 'info.json'), 'w') as file:
+            json.dump(source.get_info(ticker), file, default=str)
+        for attribute in attributes:
+            df = source.get_statement(ticker, attribute)
+            df.columns = pd.DatetimeIndex(df.columns).strftime('%Y-%m-%d')
+            df.to_csv(self.path(ticker, f'{attribute}.csv'))
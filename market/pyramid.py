@@ -0,0 +1,149 @@
+import json
+import os
+
+import numpy as np
+
+from market.history import COLUMNS, OHLCVView
+
+# bars merged into one at each step up the pyramid
+PYRAMID_FACTOR = 4
+# levels stop once they are this short
+PYRAMID_MIN_BARS = 256
+
+
+def aggregate(arrays, factor):
+    """
+    Merge every factor consecutive bars into one
+
+    Keeps the first Date and Open, the max High, the min Low, the last Close
+    and the summed Volume, if there is one, of each group; the last group
+    may be short
+    """
+    n = len(arrays['Date'])
+    if factor <= 1 or not n:
+        return dict(arrays)
+    starts = np.arange(0, n, factor)
+    ends = np.minimum(starts + factor, n) - 1
+    merged = {
+        'Date': arrays['Date'][starts],
+        'Open': arrays['Open'][starts],
+        'High': np.maximum.reduceat(arrays['High'], starts),
+        'Low': np.minimum.reduceat(arrays['Low'], starts),
+        'Close': arrays['Close'][ends],
+    }
+    if 'Volume' in arrays:
+        merged['Volume'] = np.add.reduceat(arrays['Volume'], starts)
+    return merged
+
+
+def window_bounds(dates, start=None, end=None, widen=False):
+    """Index range of the bars in [start, end); widen also takes the bucket holding start"""
+    if start is None:
+        lo = 0
+    elif widen:
+        lo = max(np.searchsorted(dates, start, side='right') - 1, 0)
+    else:
+        lo = np.searchsorted(dates, start)
+    hi = len(dates) if end is None else np.searchsorted(dates, end)
+    return lo, hi
+
+
+class OHLCPyramid:
+    """
+    Multi-resolution OHLCV aggregation of one price series
+
+    Level 0 is the series itself and level k merges PYRAMID_FACTOR ** k bars
+    per bar, so a chart can ask for a date window at a pixel width and get
+    at most about that many bars back, whatever the length of the history.
+    Levels are built once from the full series; windows are plain slices.
+    A PriceHistoryStore ticker keeps its levels on disk next to its columns
+    and they are rebuilt only when the columns have been rewritten.
+    """
+    def __init__(self, ticker, levels, factor=PYRAMID_FACTOR):
+        self.ticker = ticker
+        self.levels = levels
+        self.factor = factor
+
+    @classmethod
+    def build(cls, ticker, arrays, factor=PYRAMID_FACTOR, min_bars=PYRAMID_MIN_BARS):
+        levels = [dict(arrays)]
+        # each level is aggregated from the one below, so the cost is ~n * 4/3
+        while len(levels[-1]['Date']) > min_bars:
+            levels.append(aggregate(levels[-1], factor))
+        return cls(ticker, levels, factor)
+
+    @staticmethod
+    def source_signature(store, ticker):
+        """The stored columns' version, new whenever save rewrites them"""
+        return store.version(ticker)
+
+    @classmethod
+    def load(cls, store, ticker, factor=PYRAMID_FACTOR, min_bars=PYRAMID_MIN_BARS):
+        """Memory-mapped pyramid of a stored ticker, rebuilt first if stale"""
+        with store.lock(ticker):
+            signature = cls.source_signature(store, ticker)
+            meta_path = store.path(ticker, 'pyramid.json')
+            meta = None
+            if os.path.exists(meta_path):
+                with open(meta_path) as file:
+                    meta = json.load(file)
+            if signature is None:
+                return cls.build(ticker, store.load(ticker), factor, min_bars)
+            if meta is None or meta['source'] != signature or meta['factor'] != factor:
+                return cls.save(store, ticker, signature, factor, min_bars)
+
+            levels = [store.load(ticker, mmap=True)]
+            for level in range(1, meta['levels']):
+                levels.append({column: np.load(cls.level_path(store, ticker, level, name), mmap_mode='r')
+                               for column, (name, _) in COLUMNS.items()})
+            return cls(ticker, levels, factor)
+
+    @staticmethod
+    def level_path(store, ticker, level, name):
+        return store.path(ticker, os.path.join('pyramid', f'{level}_{name}.npy'))
+
+    @classmethod
+    def save(cls, store, ticker, signature, factor, min_bars):
+        pyramid = cls.build(ticker, store.load(ticker, mmap=True), factor, min_bars)
+        os.makedirs(store.path(ticker, 'pyramid'), exist_ok=True)
+        # level 0 is the stored history itself
+        for level, arrays in enumerate(pyramid.levels[1:], start=1):
+            for column, (name, dtype) in COLUMNS.items():
+                path = cls.level_path(store, ticker, level, name)
+                tmp = path[:-len('.npy')] + '.tmp.npy'
+                np.save(tmp, np.ascontiguousarray(arrays[column], dtype=dtype))
+                os.replace(tmp, path)
+        # written last, so a half-written pyramid is never taken for current
+        meta = {'source': signature, 'factor': factor, 'levels': len(pyramid.levels)}
+        tmp = store.path(ticker, 'pyramid.tmp.json')
+        with open(tmp, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmp, store.path(ticker, 'pyramid.json'))
+        return pyramid
+
+    def __len__(self):
+        return len(self.levels[0]['Date'])
+
+    def level_for(self, start=None, end=None, width=1000):
+        """Finest level showing [start, end) in at most width bars"""
+        for level, arrays in enumerate(self.levels):
+            lo, hi = window_bounds(arrays['Date'], start, end)
+            if hi - lo <= width:
+                return level
+        return len(self.levels) - 1
+
+    def window(self, start=None, end=None, width=1000):
+        """OHLCVView of [start, end) at the resolution that fits width"""
+        if start is not None:
+            start = np.datetime64(start)
+        if end is not None:
+            end = np.datetime64(end)
+        level = self.level_for(start, end, width)
+        arrays = self.levels[level]
+        lo, hi = window_bounds(arrays['Date'], start, end, widen=level > 0)
+        arrays = {column: values[lo:hi] for column, values in arrays.items()}
+        # even the coarsest level is too long for a narrow chart: merge its
+        # window once more, into a copy of at most width bars (widening adds a bar)
+        if hi - lo > width + (level > 0):
+            arrays = aggregate(arrays, -(-(hi - lo) // max(width, 1)))
+        return OHLCVView(self.ticker, arrays)
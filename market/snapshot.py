@@ -0,0 +1,73 @@
+import threading
+from collections import Counter
+
+from market.cache import DEFAULT_TTL, MISSING, TTLCache
+
+
+class TickerSnapshot:
+    """
+    Memoized view of one ticker served by a MarketDataProvider
+
+    Each attribute (info, balance_sheet, quarterly_income_stmt, ...) is
+    fetched at most once per snapshot; every fetch is counted by the owner
+    """
+    def __init__(self, symbol, provider, count, limiter=None):
+        self.symbol = symbol
+        self._provider = provider
+        self._count = count
+        self._limiter = limiter
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, attribute):
+        """Return an upstream attribute, fetching it on first access"""
+        with self._lock:
+            value = self._values.get(attribute, MISSING)
+            if value is MISSING:
+                if self._limiter is not None:
+                    self._limiter.acquire()
+                if attribute == 'info':
+                    value = self._provider.get_info(self.symbol)
+                else:
+                    value = self._provider.get_statement(self.symbol, attribute)
+                self._count(attribute)
+                self._values[attribute] = value
+            return value
+
+    @property
+    def info(self):
+        return self.get('info')
+
+    def statements(self, attributes):
+        """Resolve {name: attribute} into {name: DataFrame}"""
+        return {name: self.get(attribute) for name, attribute in attributes.items()}
+
+
+class SnapshotCache:
+    """
+    Bounded, expiring set of TickerSnapshots shared by MarketData methods
+
+    stats counts upstream fetches per attribute, e.g. stats['info']
+    """
+    def __init__(self, provider, maxsize=128, ttl=DEFAULT_TTL['snapshot'], limiter=None):
+        self.provider = provider
+        self.limiter = limiter
+        self.snapshots = TTLCache(maxsize, ttl)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, attribute):
+        with self._lock:
+            self.stats[attribute] += 1
+
+    def get(self, symbol):
+        """Return the live snapshot for a symbol, starting a new one if needed"""
+        with self._lock:
+            snapshot = self.snapshots.get(symbol)
+            if snapshot is None:
+                snapshot = TickerSnapshot(symbol, self.provider, self.count, self.limiter)
+                self.snapshots.put(symbol, snapshot)
+            return snapshot
+
+    def invalidate(self, symbol=None):
+        self.snapshots.invalidate(None if symbol is None else lambda key: key == symbol)
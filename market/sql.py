@@ -1,17 +1,245 @@
+import hashlib
+import json
 import sqlite3
-import pandas as pd
+import threading
+import weakref
+from collections import namedtuple
 from datetime import datetime
 import numpy as np
+from market.cache import TTLCache
+from market.lazy import lazy_import
+from market.panel import DAY_SPAN, QUARTERLY_STATEMENT_TYPES, FinancialAsOf, pct_change
+
+pd = lazy_import('pandas')
+
+# pragmas applied to every connection: WAL lets readers run next to the bulk
+# writer and NORMAL sync only fsyncs on checkpoints, which is safe under WAL
+BULK_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+)
+
+# compiled statements kept per connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 256
+
+UPSERT_FINANCIAL_DATA = '''
+    INSERT OR REPLACE INTO financial_data
+    (ticker, statement_type, metric_name, date, value, last_updated)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# as-of reads over every ticker filter on statement and metric only, which
+# the (ticker, ...) primary key can't seek to; this covers them
+CREATE_ASOF_INDEX = '''
+    CREATE INDEX IF NOT EXISTS financial_data_asof
+    ON financial_data (statement_type, metric_name, ticker, date, value)
+'''
+
+# last_updated only moves when the content hash changes, last_checked on every refresh
+UPSERT_STATEMENT_HASH = '''
+    INSERT INTO statement_hash
+    (ticker, statement_type, content_hash, last_updated, last_checked)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (ticker, statement_type) DO UPDATE SET
+        last_updated = CASE WHEN content_hash = excluded.content_hash
+                            THEN last_updated ELSE excluded.last_updated END,
+        content_hash = excluded.content_hash,
+        last_checked = excluded.last_checked
+'''
+
+# statements that get QoQ / YoY growth maintained in derived_metrics
+DERIVED_STATEMENT_PREFIX = 'Quarterly '
+
+UPSERT_DERIVED_METRICS = '''
+    INSERT OR REPLACE INTO derived_metrics
+    (ticker, statement_type, metric_name, date, value_mm, qoq_growth, yoy_growth)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPSERT_UPDATE_LOG = '''
+    INSERT OR REPLACE INTO update_log (ticker, last_updated)
+    VALUES (?, ?)
+'''
+
+# statements written by load_rows: the stored hash no longer describes them,
+# so the next refresh diffs them cell by cell instead of skipping
+MARK_STATEMENT_LOADED = '''
+    INSERT INTO statement_hash
+    (ticker, statement_type, content_hash, last_updated, last_checked)
+    VALUES (?, ?, NULL, ?, ?)
+    ON CONFLICT (ticker, statement_type) DO UPDATE SET
+        content_hash = NULL,
+        last_updated = excluded.last_updated,
+        last_checked = excluded.last_checked
+'''
+
+# how far a bulk load got through a file, committed with the rows it covers
+UPSERT_LOAD_PROGRESS = '''
+    INSERT OR REPLACE INTO load_progress
+    (path, size, mtime_ns, position, last_updated)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Compact layout: labels live once in lookup tables and financial_values
+# holds integer ids and day numbers (days since 1970-01-01), clustered on
+# its primary key, so every lookup by ticker reads one contiguous range
+# and needs no separate index. financial_data becomes a view with the old
+# columns for the readers that go by name.
+LOOKUP_TABLES = ('tickers', 'statement_types', 'metrics')
+
+CREATE_COMPACT_SCHEMA = (
+    *(f'CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)'
+      for table in LOOKUP_TABLES),
+    '''
+    CREATE TABLE IF NOT EXISTS financial_values (
+        ticker_id INTEGER NOT NULL,
+        statement_id INTEGER NOT NULL,
+        metric_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        value REAL,
+        last_updated TIMESTAMP,
+        PRIMARY KEY (ticker_id, statement_id, metric_id, day)
+    ) WITHOUT ROWID
+    ''',
+)
+
+CREATE_FINANCIAL_DATA_VIEW = '''
+    CREATE VIEW IF NOT EXISTS financial_data AS
+    SELECT t.name AS ticker, s.name AS statement_type, m.name AS metric_name,
+           date(v.day * 86400, 'unixepoch') AS date, v.value, v.last_updated
+    FROM financial_values v
+    JOIN tickers t ON t.id = v.ticker_id
+    JOIN statement_types s ON s.id = v.statement_id
+    JOIN metrics m ON m.id = v.metric_id
+'''
+
+# legacy financial_data rows, copied in primary key order; a date sqlite
+# can't parse has no day number, so its row is left behind
+MIGRATE_FINANCIAL_DATA = '''
+    INSERT OR REPLACE INTO financial_values
+    SELECT t.id, s.id, m.id, CAST(julianday(f.date) - 2440587.5 AS INTEGER), f.value, f.last_updated
+    FROM financial_data_legacy f
+    JOIN tickers t ON t.name = f.ticker
+    JOIN statement_types s ON s.name = f.statement_type
+    JOIN metrics m ON m.name = f.metric_name
+    WHERE julianday(f.date) IS NOT NULL
+    ORDER BY t.id, s.id, m.id, 4
+'''
+
+UPSERT_FINANCIAL_VALUES = '''
+    INSERT OR REPLACE INTO financial_values
+    (ticker_id, statement_id, metric_id, day, value, last_updated)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+# recently pivoted get_financial_arrays results kept in memory
+ARRAY_CACHE_SIZE = 64
+
+# distinct metric tuples / date arrays remembered for sharing between results
+AXIS_CACHE_SIZE = 4096
+
+# dense metrics x dates block of one statement; metrics and dates are
+# interned, so blocks with the same axes share them
+FinancialArray = namedtuple('FinancialArray', ['metrics', 'dates', 'values'])
+
+
+class ThreadToken:
+    """Kept in a thread's local storage, so it is collected when the thread exits"""
+
+
+class ConnectionManager:
+    """
+    Long-lived sqlite connections, one per thread
+
+    Each thread lazily opens its own connection and keeps it, along with its
+    page cache and compiled statement cache, until the thread exits or
+    close() is called. WAL mode lets reader threads run while another
+    thread writes.
+    """
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        # reentrant: a thread's finalizer may run while that thread holds it
+        self._lock = threading.RLock()
+        self._connections = []
+
+    def get(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # close() may run on another thread, so don't pin connections to their creator
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                                   check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            for pragma in BULK_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            # short-lived worker threads must not leave their connection open
+            self._local.token = ThreadToken()
+            weakref.finalize(self._local.token, self.release, conn)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release(self, conn):
+        """Close one thread's connection once that thread is gone"""
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        """Close every connection opened so far; the next get() reopens"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
 
 class FinancialDatabase:
-    def __init__(self, db_path='financial_statements.db'):
-        """Initialize database connection"""
+    def __init__(self, db_path='financial_statements.db', compact=False):
+        """
+        Initialize database connection
+        compact stores financial_data dictionary-encoded (see
+        CREATE_COMPACT_SCHEMA), migrating an existing file in place; a file
+        already in the compact layout is always opened as such
+        """
         self.db_path = db_path
+        self.connections = ConnectionManager(db_path)
+        self.array_cache = TTLCache(ARRAY_CACHE_SIZE)
+        # axis contents -> the one shared tuple / array holding them; an
+        # evicted axis stays alive in the arrays using it, it is just no
+        # longer handed to new ones
+        self._axes = TTLCache(AXIS_CACHE_SIZE)
+        self._lookup_lock = threading.Lock()
+        self.reset_lookups()
         self.initialize_database()
+        self.compact = self.is_compact()
+        if compact and not self.compact:
+            self.migrate_to_compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connect(self):
+        """Return this thread's long-lived connection, tuned for bulk loading"""
+        return self.connections.get()
+
+    def close(self):
+        """Close all pooled connections"""
+        self.connections.close()
     
     def initialize_database(self):
         """Create necessary tables if they don't exist"""
-        with sqlite3.connect(self.db_path) as conn:
+        self.recover_migration()
+        with self.connect() as conn:
             # Create tables for each statement type
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS financial_data (
@@ -24,6 +252,10 @@ class FinancialDatabase:
                     PRIMARY KEY (ticker, statement_type, metric_name, date)
                 )
             ''')
+            # a compact file has a view by that name, its primary key serves as-of reads
+            kind, = conn.execute("SELECT type FROM sqlite_master WHERE name = 'financial_data'").fetchone()
+            if kind == 'table':
+                conn.execute(CREATE_ASOF_INDEX)
             
             # Create table to track last update for each ticker
             conn.execute('''
@@ -32,82 +264,773 @@ class FinancialDatabase:
                     last_updated TIMESTAMP
                 )
             ''')
-          
+
+            # Content hash per statement so unchanged refreshes can be skipped
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS statement_hash (
+                    ticker TEXT,
+                    statement_type TEXT,
+                    content_hash TEXT,
+                    last_updated TIMESTAMP,
+                    last_checked TIMESTAMP,
+                    PRIMARY KEY (ticker, statement_type)
+                )
+            ''')
+
+            # Growth figures kept next to the raw quarterly values
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS derived_metrics (
+                    ticker TEXT,
+                    statement_type TEXT,
+                    metric_name TEXT,
+                    date TEXT,
+                    value_mm REAL,
+                    qoq_growth REAL,
+                    yoy_growth REAL,
+                    PRIMARY KEY (ticker, statement_type, metric_name, date)
+                )
+            ''')
+
+            # Resume points of bulk file loads, valid while size and mtime match
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS load_progress (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    position INTEGER,
+                    last_updated TIMESTAMP
+                )
+            ''')
+
+            # Statements a bulk load wrote whose derived_metrics it has yet to rebuild
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS derived_pending (
+                    ticker TEXT,
+                    statement_type TEXT,
+                    PRIMARY KEY (ticker, statement_type)
+                )
+            ''')
+
+    def is_compact(self):
+        """Whether this file keeps financial_data in the compact layout"""
+        with self.connect() as conn:
+            kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'financial_data'").fetchone()
+        return kind is not None and kind[0] == 'view'
+
+    def recover_migration(self):
+        """
+        Put financial_data back from a compact migration that was cut short
+        and left it renamed to financial_data_legacy
+        Refuses to open the file when rows were written on both sides
+        """
+        find = '''
+            SELECT name, type FROM sqlite_master
+            WHERE name IN ('financial_data', 'financial_data_legacy')
+        '''
+        # a plain read first, so opening a healthy file never takes the write lock
+        with self.connect() as conn:
+            if 'financial_data_legacy' not in dict(conn.execute(find)):
+                return
+        with self.connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # another process may have recovered it meanwhile
+            kinds = dict(conn.execute(find))
+            if 'financial_data_legacy' not in kinds:
+                return
+            kind = kinds.get('financial_data')
+            if kind == 'table' and not conn.execute('SELECT 1 FROM financial_data LIMIT 1').fetchone():
+                conn.execute('DROP TABLE financial_data')
+                kind = None
+            if kind is not None:
+                raise sqlite3.DatabaseError(
+                    f'{self.db_path} has both financial_data and financial_data_legacy '
+                    'after an interrupted migration; keep one of them before opening it')
+            # the half-built compact tables are recreated by the next migration
+            for table in ('financial_values', *LOOKUP_TABLES):
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
+            conn.execute('ALTER TABLE financial_data_legacy RENAME TO financial_data')
+
+    def migrate_to_compact(self):
+        """
+        Move financial_data into the compact layout in one transaction,
+        then vacuum so the file actually shrinks
+        Rows whose date sqlite can't parse are not carried over
+        Returns the number of rows migrated
+        """
+        with self.connect() as conn:
+            # explicit so the schema changes share it too; left to sqlite3
+            # each one commits alone, stranding the renamed table on failure
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('ALTER TABLE financial_data RENAME TO financial_data_legacy')
+            for statement in CREATE_COMPACT_SCHEMA:
+                conn.execute(statement)
+            # ids follow name order, so id order matches the old key order
+            for table, column in zip(LOOKUP_TABLES, ('ticker', 'statement_type', 'metric_name')):
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO {table} (name)
+                    SELECT DISTINCT {column} FROM financial_data_legacy ORDER BY {column}
+                ''')
+            migrated = conn.execute(MIGRATE_FINANCIAL_DATA).rowcount
+            conn.execute('DROP TABLE financial_data_legacy')
+            conn.execute(CREATE_FINANCIAL_DATA_VIEW)
+        conn.execute('VACUUM')
+        self.compact = True
+        self.reset_lookups()
+        self.array_cache.invalidate()
+        return migrated
+
+    def reset_lookups(self):
+        """Forget cached lookup ids; they are reloaded from the tables on demand"""
+        with self._lookup_lock:
+            self._ids = {table: {} for table in LOOKUP_TABLES}
+            # metric id -> name, and -> position of the name in sorted order
+            self._metric_names = np.empty(0, dtype=object)
+            self._metric_rank = np.empty(0, dtype='i8')
+
+    def lookup_ids(self, conn, table, names):
+        """{name: id} covering names, adding the ones the lookup table lacks"""
+        with self._lookup_lock:
+            ids = self._ids[table]
+            missing = [name for name in dict.fromkeys(names) if name not in ids]
+            if missing:
+                conn.executemany(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)',
+                                 [(name,) for name in missing])
+                ids.update(conn.execute(
+                    f'SELECT name, id FROM {table} WHERE name IN (SELECT value FROM json_each(?))',
+                    [json.dumps(missing)]))
+            return ids
+
+    def metric_names(self, conn, metric_ids):
+        """(names, sort ranks) of metric ids, reloading the table for unseen ids"""
+        with self._lookup_lock:
+            if len(metric_ids) and metric_ids.max() >= len(self._metric_names):
+                pairs = conn.execute('SELECT id, name FROM metrics').fetchall()
+                ids, names = zip(*pairs)
+                self._metric_names = np.empty(max(ids) + 1, dtype=object)
+                self._metric_names[list(ids)] = names
+                self._metric_rank = np.zeros(len(self._metric_names), dtype='i8')
+                self._metric_rank[[ids[i] for i in np.argsort(np.asarray(names, dtype=object))]] = \
+                    np.arange(len(ids))
+            return self._metric_names[metric_ids], self._metric_rank[metric_ids]
+
+    def write_financial_rows(self, conn, rows):
+        """Upsert long-form (ticker, statement_type, metric_name, date, value, last_updated) rows"""
+        if not self.compact:
+            conn.executemany(UPSERT_FINANCIAL_DATA, rows)
+            return
+        if not rows:
+            return
+        tickers, statement_types, metrics, dates, values, timestamps = zip(*rows)
+        codes = [self.lookup_ids(conn, table, names) for table, names in
+                 zip(LOOKUP_TABLES, (tickers, statement_types, metrics))]
+        ticker_ids, statement_ids, metric_ids = ([ids[name] for name in names] for ids, names in
+                                                 zip(codes, (tickers, statement_types, metrics)))
+        days = self.day_numbers(dates).tolist()
+        conn.executemany(UPSERT_FINANCIAL_VALUES,
+                         zip(ticker_ids, statement_ids, metric_ids, days, values, timestamps))
+
+    @staticmethod
+    def day_numbers(dates):
+        """Days since 1970-01-01 of ISO dates"""
+        return np.asarray(dates, dtype='datetime64[D]').astype('i8')
+
+    @staticmethod
+    def normalize_statement(df):
+        """Split a metrics x dates statement into labels, ISO dates and a float matrix"""
+        # Convert dates to string format for consistent storage
+        dates = pd.DatetimeIndex(df.columns).strftime('%Y-%m-%d')
+        values = df.to_numpy(dtype='f8', na_value=np.nan)
+        return np.asarray(df.index, dtype=object), np.asarray(dates, dtype=object), values
+
+    @staticmethod
+    def statement_hash(metrics, dates, values):
+        """Content hash of a normalized statement"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update('\x1f'.join(map(str, metrics)).encode())
+        digest.update('\x1f'.join(dates).encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def statement_to_rows(ticker_symbol, statement_type, metrics, dates, values, timestamp, mask=None):
+        """Reshape a normalized statement into long-form upsert rows, optionally only masked cells"""
+        n_metrics, n_dates = values.shape
+        metrics = np.repeat(metrics, n_dates)
+        dates = np.tile(dates, n_metrics)
+        values = values.ravel()
+        if mask is not None:
+            mask = mask.ravel()
+            metrics, dates, values = metrics[mask], dates[mask], values[mask]
+        # sqlite stores NaN as NULL anyway, make it explicit
+        values = np.where(np.isnan(values), None, values)
+
+        n_rows = len(values)
+        return list(zip([ticker_symbol] * n_rows,
+                        [statement_type] * n_rows,
+                        metrics.tolist(),
+                        dates.tolist(),
+                        values.tolist(),
+                        [timestamp] * n_rows))
+
+    @staticmethod
+    def changed_cells(stored, metrics, dates, values):
+        """Mask of the cells that differ from the stored statement"""
+        if stored.empty:
+            return np.ones(values.shape, dtype=bool)
+        old = stored.reindex(index=metrics, columns=dates).to_numpy(dtype='f8', na_value=np.nan)
+        same = (values == old) | (np.isnan(values) & np.isnan(old))
+        return ~same
+
+    @staticmethod
+    def derived_rows(ticker_symbol, statement_type, stored, metrics, dates, values, mask):
+        """
+        derived_metrics rows touched by writing the masked cells: each changed
+        period itself, the next period (QoQ) and the period a year on (YoY);
+        a period backfilled before the last stored one shifts every later
+        period, so all of those are touched
+        """
+        incoming = pd.DataFrame(values, index=metrics, columns=dates)
+        if stored.empty:
+            series = incoming
+        else:
+            series = stored.reindex(index=stored.index.union(incoming.index),
+                                    columns=stored.columns.union(incoming.columns))
+            series.loc[incoming.index, incoming.columns] = values
+        # ISO dates sort chronologically
+        series = series.sort_index(axis=1)
+        series_values = series.to_numpy(dtype='f8', na_value=np.nan)
+
+        changed = np.zeros(series_values.shape, dtype=bool)
+        changed[np.ix_(series.index.get_indexer(metrics), series.columns.get_indexer(dates))] = mask
+        affected = changed.copy()
+        affected[:, 1:] |= changed[:, :-1]
+        affected[:, 4:] |= changed[:, :-4]
+        if not stored.empty:
+            backfilled = series.columns.get_indexer(pd.Index(dates).difference(stored.columns))
+            if len(backfilled) and backfilled.min() < len(series.columns) - 1:
+                affected[:, backfilled.min():] = True
+
+        rows, cols = np.nonzero(affected)
+        derived = [series_values[rows, cols] / 1_000_000,
+                   pct_change(series_values, 1)[rows, cols],
+                   pct_change(series_values, 4)[rows, cols]]
+        derived = [np.where(np.isnan(column), None, column).tolist() for column in derived]
+        return list(zip([ticker_symbol] * len(rows),
+                        [statement_type] * len(rows),
+                        series.index[rows].tolist(),
+                        series.columns[cols].tolist(),
+                        *derived))
+
     def update_financial_data(self, ticker_symbol, statements):
         """Update financial data for a given ticker"""
-        #ticker = yf.Ticker(ticker_symbol)
-        current_time = datetime.now()
-        
-        # Get all financial statements
-        #statements = {
-        #    'Balance Sheet': ticker.balance_sheet,
-        #    'Income Statement': ticker.income_stmt,
-        #    'Cash Flow': ticker.cash_flow
-        #}
-        
-        with sqlite3.connect(self.db_path) as conn:
-            for statement_type, df in statements.items():
-                if df is None or df.empty:
-                    continue
-                    
-                # Convert dates to string format for consistent storage
-                df.columns = df.columns.strftime('%Y-%m-%d')
-                
-                # Process each metric in the statement
-                for metric_name in df.index:
-                    for date, value in df.loc[metric_name].items():
-                        # Convert numpy/pandas types to Python native types
-                        if isinstance(value, (np.integer, np.floating)):
-                            value = float(value)
-                        
-                        # Insert or update the value
-                        conn.execute('''
-                            INSERT OR REPLACE INTO financial_data 
-                            (ticker, statement_type, metric_name, date, value, last_updated)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (ticker_symbol, statement_type, metric_name, date, value, current_time))
-            
-            # Update the log
-            conn.execute('''
-                INSERT OR REPLACE INTO update_log (ticker, last_updated)
-                VALUES (?, ?)
-            ''', (ticker_symbol, current_time))
+        self.bulk_update_financial_data({ticker_symbol: statements})
+
+    def bulk_update_financial_data(self, statements_by_ticker):
+        """
+        Update financial data for many tickers in a single transaction
+        statements_by_ticker maps a ticker to {statement_type: DataFrame}
+        Statements whose content hash is unchanged are skipped, otherwise
+        only the cells that differ from the stored values are written
+        Returns the number of rows written
+        """
+        # ISO text, the same value sqlite3's default datetime adapter stores
+        current_time = datetime.now().isoformat(' ')
+        try:
+            with self.connect() as conn:
+                # only the tickers being written, so a single-ticker refresh stays cheap
+                tickers = [json.dumps(list(statements_by_ticker))]
+                stored_hashes = {
+                    (ticker_symbol, statement_type): content_hash
+                    for ticker_symbol, statement_type, content_hash in conn.execute(
+                        'SELECT ticker, statement_type, content_hash FROM statement_hash '
+                        'WHERE ticker IN (SELECT value FROM json_each(?))', tickers)
+                }
+                # tickers never written before can skip the per-cell diff
+                known_tickers = {ticker for ticker, in conn.execute(
+                    'SELECT ticker FROM update_log WHERE ticker IN (SELECT value FROM json_each(?))', tickers)}
+
+                rows, hashes, derived = [], [], []
+                for ticker_symbol, statements in statements_by_ticker.items():
+                    for statement_type, df in statements.items():
+                        if df is None or df.empty:
+                            # still record the check so freshness covers empty statements
+                            hashes.append((ticker_symbol, statement_type, '',
+                                           current_time, current_time))
+                            continue
+
+                        metrics, dates, values = self.normalize_statement(df)
+                        content_hash = self.statement_hash(metrics, dates, values)
+                        hashes.append((ticker_symbol, statement_type, content_hash,
+                                       current_time, current_time))
+                        if stored_hashes.get((ticker_symbol, statement_type)) == content_hash:
+                            continue
+
+                        stored = pd.DataFrame()
+                        if ticker_symbol in known_tickers:
+                            stored = self.query_financial_data(conn, ticker_symbol, statement_type)
+                        mask = self.changed_cells(stored, metrics, dates, values)
+                        rows.extend(self.statement_to_rows(
+                            ticker_symbol, statement_type, metrics, dates, values, current_time, mask))
+                        if statement_type.startswith(DERIVED_STATEMENT_PREFIX):
+                            derived.extend(self.derived_rows(
+                                ticker_symbol, statement_type, stored, metrics, dates, values, mask))
+
+                self.write_financial_rows(conn, rows)
+                conn.executemany(UPSERT_STATEMENT_HASH, hashes)
+                conn.executemany(UPSERT_DERIVED_METRICS, derived)
+
+                # Update the log
+                conn.executemany(UPSERT_UPDATE_LOG, [
+                    (ticker_symbol, current_time) for ticker_symbol in statements_by_ticker])
+        except BaseException:
+            # lookup ids handed out in a transaction that rolled back must not be reused
+            self.reset_lookups()
+            raise
+        if rows:
+            self.array_cache.invalidate()
+        return len(rows)
+
+    def load_rows(self, rows, checkpoint=None, marked=None):
+        """
+        Upsert long-form (ticker, statement_type, metric_name, date, value,
+        last_updated) rows as given, in one transaction, without the
+        per-statement hash and diff of bulk_update_financial_data
+        The statements touched get their hash cleared, their ticker logged
+        and their derived metrics rebuilt; checkpoint, a (path, size,
+        mtime_ns, position) load_progress entry, commits with the rows
+        A load split over many calls passes the same marked set to each:
+        statements in it are not marked again, the others are added once
+        committed, and derived metrics wait in derived_pending for
+        rebuild_pending_derived()
+        Returns the number of rows written
+        """
+        current_time = datetime.now().isoformat(' ')
+        statements = sorted({(ticker_symbol, statement_type) for ticker_symbol, statement_type, *_ in rows}
+                            - (marked or set()))
+        tickers = list(dict.fromkeys(ticker_symbol for ticker_symbol, _ in statements))
+        derived = [(ticker_symbol, statement_type) for ticker_symbol, statement_type in statements
+                   if statement_type.startswith(DERIVED_STATEMENT_PREFIX)]
+        try:
+            with self.connect() as conn:
+                self.write_financial_rows(conn, rows)
+                conn.executemany(MARK_STATEMENT_LOADED, [
+                    (ticker_symbol, statement_type, current_time, current_time)
+                    for ticker_symbol, statement_type in statements])
+                conn.executemany(UPSERT_UPDATE_LOG, [(ticker_symbol, current_time) for ticker_symbol in tickers])
+                if marked is None:
+                    conn.executemany(UPSERT_DERIVED_METRICS, self.rebuilt_derived_rows(conn, derived))
+                else:
+                    # recorded with the rows, so an interrupted load still gets them rebuilt
+                    conn.executemany('INSERT OR IGNORE INTO derived_pending VALUES (?, ?)', derived)
+                if checkpoint is not None:
+                    conn.execute(UPSERT_LOAD_PROGRESS, (*checkpoint, current_time))
+        except BaseException:
+            self.reset_lookups()
+            raise
+        if marked is not None:
+            marked.update(statements)
+        if rows:
+            self.array_cache.invalidate()
+        return len(rows)
+
+    def rebuild_pending_derived(self):
+        """
+        Rebuild the derived metrics of every statement in derived_pending
+        and clear it; returns the number of statements rebuilt
+        """
+        with self.connect() as conn:
+            statements = conn.execute('SELECT ticker, statement_type FROM derived_pending').fetchall()
+            conn.executemany(UPSERT_DERIVED_METRICS, self.rebuilt_derived_rows(conn, statements))
+            conn.execute('DELETE FROM derived_pending')
+        return len(statements)
+
+    def load_progress(self, path):
+        """(size, mtime_ns, position) recorded for a bulk load of path, or None"""
+        with self.connect() as conn:
+            return conn.execute(
+                'SELECT size, mtime_ns, position FROM load_progress WHERE path = ?', (path,)).fetchone()
     
     def get_financial_data(self, ticker_symbol, statement_type=None, start_date=None, end_date=None):
         """Retrieve financial data from database"""
-        with sqlite3.connect(self.db_path) as conn:
-            query = '''
-                SELECT metric_name, date, value
-                FROM financial_data
-                WHERE ticker = ?
+        with self.connect() as conn:
+            return self.query_financial_data(conn, ticker_symbol, statement_type, start_date, end_date)
+
+    def query_financial_data(self, conn, ticker_symbol, statement_type=None, start_date=None, end_date=None):
+        """Retrieve financial data over an open connection"""
+        if self.compact:
+            return self.query_financial_values(conn, ticker_symbol, statement_type, start_date, end_date)
+        query = 'SELECT metric_name, date, value FROM financial_data WHERE ticker = ?'
+        params = [ticker_symbol]
+
+        if statement_type:
+            query += ' AND statement_type = ?'
+            params.append(statement_type)
+
+        if start_date:
+            query += ' AND date >= ?'
+            params.append(start_date)
+
+        if end_date:
+            query += ' AND date <= ?'
+            params.append(end_date)
+
+        # Pivot straight from the cursor to match the original DataFrame format
+        rows = conn.execute(query + ' ORDER BY metric_name, date', params).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        metrics, dates, values = zip(*rows)
+        return self.pivot_frame(metrics, dates, values)
+
+    def query_financial_values(self, conn, ticker_symbol, statement_type=None, start_date=None, end_date=None):
+        """query_financial_data against the compact layout, by id and day number"""
+        query = '''
+            SELECT metric_id, day, value FROM financial_values
+            WHERE ticker_id = (SELECT id FROM tickers WHERE name = ?)
+        '''
+        params = [ticker_symbol]
+        if statement_type:
+            query += ' AND statement_id = (SELECT id FROM statement_types WHERE name = ?)'
+            params.append(statement_type)
+        query, params = self.day_filter(query, params, start_date, end_date)
+
+        rows = conn.execute(query, params).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        metric_ids, days, values = zip(*rows)
+        metrics, rank = self.metric_names(conn, np.asarray(metric_ids, dtype='i8'))
+        return self.pivot_frame(metrics, days, values, rank)
+
+    def day_filter(self, query, params, start_date=None, end_date=None, column='day'):
+        """Add start / end date bounds on a day number column"""
+        if start_date:
+            query += f' AND {column} >= ?'
+            params.append(int(self.day_numbers(pd.Timestamp(start_date).strftime('%Y-%m-%d'))))
+        if end_date:
+            query += f' AND {column} <= ?'
+            params.append(int(self.day_numbers(pd.Timestamp(end_date).strftime('%Y-%m-%d'))))
+        return query, params
+
+    @classmethod
+    def pivot_frame(cls, metrics, dates, values, metric_order=None):
+        """metric_name x date frame, as the original pivot returned it"""
+        (metric_axis, date_axis, block), = cls.pivot_rows(
+            np.zeros(len(values), dtype='i8'), metrics, dates, values, metric_order)
+        return pd.DataFrame(block, index=pd.Index(metric_axis, name='metric_name'),
+                            columns=pd.Index(np.datetime_as_string(date_axis), name='date'))
+
+    @staticmethod
+    def pivot_rows(groups, metrics, dates, values, metric_order=None):
+        """
+        Dense (metrics, dates, values) blocks from long-form rows
+
+        Each distinct group code, in ascending order, becomes one metrics x
+        dates block with both axes sorted. All blocks are views into a single
+        array filled in one scatter. metric_order, integers that sort like
+        the metric names, saves comparing the names themselves.
+        """
+        groups = np.asarray(groups)
+        metrics = np.asarray(metrics, dtype=object)
+        days = np.asarray(dates, dtype='datetime64[D]').astype('i8')
+        values = np.asarray(values, dtype='f8')
+        n = len(values)
+
+        # rows read through the primary key come sorted by group, then metric
+        same_group = groups[1:] == groups[:-1]
+        keys = metrics if metric_order is None else np.asarray(metric_order)
+        if np.any(groups[1:] < groups[:-1]) or np.any(same_group & (keys[1:] < keys[:-1])):
+            if metric_order is None:
+                _, keys = np.unique(metrics, return_inverse=True)
+            order = np.lexsort((keys, groups))
+            groups, metrics, days, values = groups[order], metrics[order], days[order], values[order]
+
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = groups[1:] != groups[:-1]
+        new_metric = new_group.copy()
+        new_metric[1:] |= metrics[1:] != metrics[:-1]
+        group_of_row = np.cumsum(new_group) - 1
+        group_start = np.flatnonzero(new_group)
+
+        # metric position within its group
+        metric_run = np.cumsum(new_metric) - 1
+        metric_code = metric_run - metric_run[group_start][group_of_row]
+        n_metrics = np.bincount(group_of_row, weights=new_metric).astype('i8')
+
+        # date position within its group, from the sorted (group, day) pairs
+        pairs, date_run = np.unique(group_of_row * DAY_SPAN + days, return_inverse=True)
+        pair_group = pairs // DAY_SPAN
+        n_dates = np.bincount(pair_group, minlength=len(group_start))
+        pair_start = np.concatenate([[0], np.cumsum(n_dates)[:-1]])
+        date_code = date_run - pair_start[group_of_row]
+
+        sizes = n_metrics * n_dates
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        cell = offsets[group_of_row] + metric_code * n_dates[group_of_row] + date_code
+        if np.bincount(cell, minlength=offsets[-1]).max(initial=0) > 1:
+            raise ValueError('Index contains duplicate entries, cannot reshape')
+        flat = np.full(offsets[-1], np.nan)
+        flat[cell] = values
+
+        metric_names = metrics[new_metric].tolist()
+        metric_offsets = np.concatenate([[0], np.cumsum(n_metrics)])
+        pair_days = (pairs % DAY_SPAN).astype('datetime64[D]')
+        blocks = []
+        for g in range(len(group_start)):
+            blocks.append((
+                tuple(metric_names[metric_offsets[g]:metric_offsets[g + 1]]),
+                pair_days[pair_start[g]:pair_start[g] + n_dates[g]],
+                flat[offsets[g]:offsets[g + 1]].reshape(n_metrics[g], n_dates[g]),
+            ))
+        return blocks
+
+    def intern(self, axis):
+        """The shared copy of a metric tuple or date array"""
+        key = axis if isinstance(axis, tuple) else axis.tobytes()
+        shared = self._axes.get(key)
+        if shared is not None:
+            return shared
+        if not isinstance(axis, tuple):
+            axis.flags.writeable = False
+        self._axes.put(key, axis)
+        return axis
+
+    def get_financial_arrays(self, tickers, statement_types=None, start_date=None, end_date=None):
+        """
+        Dense arrays of many tickers' statements in one query
+        Returns {(ticker, statement_type): FinancialArray} with metrics x dates
+        values (NaN where missing), dates ascending as datetime64[D]
+        Results are cached until the statements queried are written again
+        """
+        tickers = list(dict.fromkeys(tickers))
+        ticker_param = json.dumps(tickers)
+        with self.connect() as conn:
+            if statement_types is None:
+                statement_types = [statement_type for statement_type, in conn.execute('''
+                    SELECT DISTINCT statement_type FROM financial_data
+                    WHERE ticker IN (SELECT value FROM json_each(?))
+                    ORDER BY statement_type
+                ''', [ticker_param])]
+            statement_types = list(dict.fromkeys(statement_types))
+            params = [ticker_param, json.dumps(statement_types)]
+
+            # statement_hash moves whenever the data under it changes, whoever wrote it
+            fingerprint = conn.execute('''
+                SELECT COUNT(*), MAX(last_updated) FROM statement_hash
+                WHERE ticker IN (SELECT value FROM json_each(?))
+                AND statement_type IN (SELECT value FROM json_each(?))
+            ''', params).fetchone()
+            key = (tuple(tickers), tuple(statement_types), start_date, end_date, fingerprint)
+            cached = self.array_cache.get(key)
+            if cached is not None:
+                return cached
+
+            # one index probe per (ticker, statement type); the json_each keys
+            # number the groups, so no label strings come back per row
+            params = [len(statement_types), *params]
+            if self.compact:
+                query = '''
+                    SELECT t.key * ? + s.key, f.metric_id, f.day, f.value
+                    FROM json_each(?) AS t
+                    CROSS JOIN json_each(?) AS s
+                    CROSS JOIN tickers ON tickers.name = t.value
+                    CROSS JOIN statement_types ON statement_types.name = s.value
+                    CROSS JOIN financial_values AS f
+                        ON f.ticker_id = tickers.id AND f.statement_id = statement_types.id
+                    WHERE 1
+                '''
+                query, params = self.day_filter(query, params, start_date, end_date, 'f.day')
+            else:
+                query = '''
+                    SELECT t.key * ? + s.key, f.metric_name, f.date, f.value
+                    FROM json_each(?) AS t
+                    CROSS JOIN json_each(?) AS s
+                    CROSS JOIN financial_data AS f ON f.ticker = t.value AND f.statement_type = s.value
+                    WHERE 1
+                '''
+                if start_date:
+                    query += ' AND f.date >= ?'
+                    params.append(start_date)
+                if end_date:
+                    query += ' AND f.date <= ?'
+                    params.append(end_date)
+            rows = conn.execute(query, params).fetchall()
+
+            arrays = {}
+            if rows:
+                groups, metrics, dates, values = zip(*rows)
+                groups = np.asarray(groups, dtype='i8')
+                metric_order = None
+                if self.compact:
+                    metrics, metric_order = self.metric_names(conn, np.asarray(metrics, dtype='i8'))
+                blocks = self.pivot_rows(groups, metrics, dates, values, metric_order)
+                for group, (metric_axis, date_axis, block) in zip(np.unique(groups).tolist(), blocks):
+                    block.flags.writeable = False
+                    ticker_symbol = tickers[group // len(statement_types)]
+                    statement_type = statement_types[group % len(statement_types)]
+                    arrays[ticker_symbol, statement_type] = FinancialArray(
+                        self.intern(metric_axis), self.intern(date_axis), block)
+        self.array_cache.put(key, arrays)
+        return arrays
+
+    def get_financial_rows(self, tickers=None, statement_types=None, metrics=None, end_date=None, latest=False):
+        """
+        Long-form (ticker, statement_type, metric_name, date, value) rows for
+        many tickers in one query; None means no filter on that column
+        latest keeps only the last non-null value of each (ticker,
+        statement_type, metric_name) up to end_date, aggregated in sqlite
+        """
+        date = 'MAX(date)' if latest else 'date'
+        # given tickers, seek the primary key rather than scan financial_data_asof
+        # for the statement type across every ticker
+        index = '' if tickers is None else ' INDEXED BY sqlite_autoindex_financial_data_1'
+        query = f'SELECT ticker, statement_type, metric_name, {date}, value FROM financial_data{index} WHERE 1'
+        columns = ('ticker', 'statement_type', 'metric_name')
+        params = []
+        if self.compact:
+            # resolve the names first so each (ticker, statement[, metric]) is one key probe
+            if latest:
+                # one backwards seek per cell to its last value, instead of
+                # aggregating every period the cell has
+                bound, params = self.day_filter('', params, end_date=end_date, column='g.day')
+                values = f'''
+                    CROSS JOIN metrics m
+                    CROSS JOIN financial_values f
+                        ON f.ticker_id = t.id AND f.statement_id = s.id AND f.metric_id = m.id
+                        AND f.day = (
+                            SELECT g.day FROM financial_values g
+                            WHERE g.ticker_id = t.id AND g.statement_id = s.id AND g.metric_id = m.id
+                            AND g.value IS NOT NULL{bound}
+                            ORDER BY g.day DESC LIMIT 1
+                        )
+                '''
+            elif metrics is None:
+                values = '''
+                    CROSS JOIN financial_values f ON f.ticker_id = t.id AND f.statement_id = s.id
+                    JOIN metrics m ON m.id = f.metric_id
+                '''
+            else:
+                values = '''
+                    CROSS JOIN metrics m
+                    CROSS JOIN financial_values f
+                        ON f.ticker_id = t.id AND f.statement_id = s.id AND f.metric_id = m.id
+                '''
+            query = f'''
+                SELECT t.name, s.name, m.name, date(f.day * 86400, 'unixepoch'), f.value
+                FROM tickers t CROSS JOIN statement_types s {values}
+                WHERE 1
             '''
-            params = [ticker_symbol]
-            
-            if statement_type:
-                query += ' AND statement_type = ?'
-                params.append(statement_type)
-            
-            if start_date:
-                query += ' AND date >= ?'
-                params.append(start_date)
-            
+            columns = ('t.name', 's.name', 'm.name')
+        # json_each binds a whole list as one parameter, however long
+        for column, wanted in zip(columns, (tickers, statement_types, metrics)):
+            if wanted is not None:
+                query += f' AND {column} IN (SELECT value FROM json_each(?))'
+                params.append(json.dumps(list(wanted)))
+        if self.compact:
+            if not latest:
+                query, params = self.day_filter(query, params, end_date=end_date, column='f.day')
+        else:
             if end_date:
                 query += ' AND date <= ?'
                 params.append(end_date)
-            
-            # Get the data and pivot it to match the original DataFrame format
-            df = pd.read_sql_query(query, conn, params=params)
-            if not df.empty:
-                pivoted = df.pivot(index='metric_name', columns='date', values='value')
-                return pivoted
-            return pd.DataFrame()
-    
-    def get_last_update(self, ticker_symbol):
-        """Get the last update time for a ticker"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                'SELECT last_updated FROM update_log WHERE ticker = ?',
-                (ticker_symbol,)
-            )
-            result = cursor.fetchone()
-            return result[0] if result else None    
\ No newline at end of file
+            if latest:
+                # with MAX() as the only aggregate, sqlite takes value from the row holding the max
+                query += ' AND value IS NOT NULL GROUP BY ticker, statement_type, metric_name'
+        with self.connect() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get_financial_asof(self, as_of, tickers=None, statement_types=QUARTERLY_STATEMENT_TYPES, metrics=None):
+        """
+        ticker x metric DataFrame of the latest value of each metric reported
+        for a period ending on or before as_of, for all tickers in one query
+        Reads the quarterly statements unless told otherwise, as annual and
+        quarterly values share metric names
+        For many dates, load a FinancialAsOf once and call at(dates)
+        """
+        as_of = pd.Timestamp(as_of).strftime('%Y-%m-%d')
+        rows = self.get_financial_rows(tickers, statement_types, metrics, as_of, latest=True)
+        return FinancialAsOf.from_rows(rows, tickers, metrics, statement_types).frame(as_of)
+
+    def get_derived_metrics(self, ticker_symbol, statement_types):
+        """Stored values (millions) and QoQ / YoY growth (%) of a ticker's statements"""
+        placeholders = ', '.join('?' * len(statement_types))
+        with self.connect() as conn:
+            return pd.read_sql_query(f'''
+                SELECT statement_type, metric_name, date, value_mm, qoq_growth, yoy_growth
+                FROM derived_metrics
+                WHERE ticker = ? AND statement_type IN ({placeholders})
+            ''', conn, params=[ticker_symbol, *statement_types])
+
+    def rebuild_derived_metrics(self, ticker_symbol=None):
+        """Recompute derived_metrics from scratch, for one ticker or all of them"""
+        query = 'SELECT DISTINCT ticker, statement_type FROM financial_data WHERE statement_type LIKE ?'
+        params = [DERIVED_STATEMENT_PREFIX + '%']
+        if ticker_symbol:
+            query += ' AND ticker = ?'
+            params.append(ticker_symbol)
+        with self.connect() as conn:
+            derived = self.rebuilt_derived_rows(conn, conn.execute(query, params).fetchall())
+            conn.executemany(UPSERT_DERIVED_METRICS, derived)
+        return len(derived)
+
+    def rebuilt_derived_rows(self, conn, statements):
+        """derived_metrics rows of whole stored (ticker, statement_type) statements"""
+        derived = []
+        for ticker, statement_type in statements:
+            stored = self.query_financial_data(conn, ticker, statement_type)
+            values = stored.to_numpy(dtype='f8', na_value=np.nan)
+            derived.extend(self.derived_rows(
+                ticker, statement_type, pd.DataFrame(), stored.index, stored.columns,
+                values, np.ones(values.shape, dtype=bool)))
+        return derived
+
+    def get_statements(self, ticker_symbol, statement_types):
+        """
+        Retrieve several statements in the shape yfinance returns them:
+        metrics as rows, Timestamp columns with the latest period first
+        """
+        statements = {}
+        with self.connect() as conn:
+            for statement_type in statement_types:
+                df = self.query_financial_data(conn, ticker_symbol, statement_type)
+                if not df.empty:
+                    df.columns = pd.to_datetime(df.columns)
+                    df = df[df.columns[::-1]]
+                    df.index.name = df.columns.name = None
+                statements[statement_type] = df
+        return statements
+
+    def get_last_update(self, ticker_symbol, statement_type=None):
+        """
+        Get the last update time for a ticker
+        With statement_type (a name or a list of names) return the oldest
+        time those statements were last checked, None if any never was
+        """
+        with self.connect() as conn:
+            if statement_type is None:
+                cursor = conn.execute(
+                    'SELECT last_updated FROM update_log WHERE ticker = ?',
+                    (ticker_symbol,)
+                )
+                result = cursor.fetchone()
+                return result[0] if result else None
+
+            statement_types = [statement_type] if isinstance(statement_type, str) else list(statement_type)
+            placeholders = ', '.join('?' * len(statement_types))
+            checked, oldest = conn.execute(f'''
+                SELECT COUNT(last_checked), MIN(last_checked)
+                FROM statement_hash
+                WHERE ticker = ? AND statement_type IN ({placeholders})
+            ''', [ticker_symbol, *statement_types]).fetchone()
+            return oldest if checked == len(statement_types) else None
+
+    def expire_statements(self, ticker_symbol=None, statement_types=None):
+        """Mark statements stale so the next read refetches them"""
+        query = 'UPDATE statement_hash SET last_checked = NULL WHERE 1'
+        params = []
+        if ticker_symbol:
+            query += ' AND ticker = ?'
+            params.append(ticker_symbol)
+        if statement_types:
+            query += f' AND statement_type IN ({", ".join("?" * len(statement_types))})'
+            params.extend(statement_types)
+        with self.connect() as conn:
+            conn.execute(query, params)
@@ -21,6 +21,10 @@ setup(
         # Profiling
         "memory_profiler",
     ],
+    extras_require={
+        # Parquet input for python -m market.bulk_load
+        "parquet": ["pyarrow"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",  # Update the license if needed
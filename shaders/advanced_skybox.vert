@@ -1,10 +1,27 @@
 #version 330 core
 layout (location = 0) in vec3 in_position;
 
-out vec4 clipCoords;
+out vec4 worldCoords;
+
+struct Light {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+};
+
+// camera and light, written once a frame by ShaderProgram.write_frame
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_light;
+    vec3 camPos;
+    Light light;
+};
 
 
 void main() {
     gl_Position = vec4(in_position, 1.0);
-    clipCoords = gl_Position;
+    // linear in the clip position, so interpolating it per fragment is exact
+    worldCoords = inverse(m_proj * mat4(mat3(m_view))) * gl_Position;
 }
\ No newline at end of file
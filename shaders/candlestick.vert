@@ -0,0 +1,66 @@
+#version 330 core
+
+// one instance per bar, geometry comes from gl_VertexID:
+// vertices 0-5 body, 6-11 wick, 12-17 volume bar
+layout (location = 0) in float in_index;
+layout (location = 1) in vec4 in_ohlc;
+layout (location = 2) in float in_volume;
+
+out vec4 v_color;
+
+uniform vec2 u_x_range;        // visible bar indices [first, last]
+uniform vec2 u_price_range;    // visible [low, high]
+uniform float u_volume_max;
+uniform vec4 u_rect;           // chart area in NDC: x0, y0, x1, y1
+uniform float u_volume_pane;   // fraction of the chart height used by volume
+uniform float u_body_width;    // body width as a fraction of the bar spacing
+uniform vec2 u_pixel;          // size of one pixel in NDC
+uniform vec4 u_up_color;
+uniform vec4 u_down_color;
+
+const vec2 corners[6] = vec2[6](
+    vec2(0.0, 0.0), vec2(1.0, 0.0), vec2(1.0, 1.0),
+    vec2(0.0, 0.0), vec2(1.0, 1.0), vec2(0.0, 1.0)
+);
+
+
+void main() {
+    int part = gl_VertexID / 6;
+    vec2 corner = corners[gl_VertexID % 6];
+
+    float open = in_ohlc.x;
+    float high = in_ohlc.y;
+    float low = in_ohlc.z;
+    float close = in_ohlc.w;
+
+    // horizontal: bar index -> NDC
+    float bars = max(u_x_range.y - u_x_range.x, 1.0);
+    float spacing = (u_rect.z - u_rect.x) / bars;
+    float center = u_rect.x + (in_index - u_x_range.x) * spacing;
+    float half_width = part == 1 ? u_pixel.x * 0.5 : max(spacing * u_body_width, u_pixel.x) * 0.5;
+    float x = center + (corner.x * 2.0 - 1.0) * half_width;
+
+    // vertical: price pane above the volume pane
+    float height = u_rect.w - u_rect.y;
+    float volume_top = u_rect.y + height * u_volume_pane;
+    float y0, y1;
+    if (part == 2) {
+        y0 = u_rect.y;
+        y1 = u_rect.y + (volume_top - u_rect.y) * in_volume / max(u_volume_max, 1.0);
+    } else {
+        float lo = part == 0 ? min(open, close) : low;
+        float hi = part == 0 ? max(open, close) : high;
+        float span = max(u_price_range.y - u_price_range.x, 1e-6);
+        y0 = volume_top + (lo - u_price_range.x) / span * (u_rect.w - volume_top);
+        y1 = volume_top + (hi - u_price_range.x) / span * (u_rect.w - volume_top);
+    }
+    // keep doji bodies and flat wicks visible
+    y1 = max(y1, y0 + u_pixel.y);
+    float y = mix(y0, y1, corner.y);
+
+    v_color = close >= open ? u_up_color : u_down_color;
+    if (part == 2) {
+        v_color.a *= 0.5;
+    }
+    gl_Position = vec4(x, y, 0.0, 1.0);
+}
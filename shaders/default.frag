@@ -14,9 +14,16 @@ struct Light {
     vec3 Is;
 };
 
-uniform Light light;
+// camera and light, written once a frame by ShaderProgram.write_frame
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_light;
+    vec3 camPos;
+    Light light;
+};
+
 uniform sampler2D u_texture_0;
-uniform vec3 camPos;
 uniform sampler2DShadow shadowMap;
 uniform vec2 u_resolution;
 
@@ -29,7 +36,7 @@ float lookup(float ox, float oy) {
 
 
 float getSoftShadowX4() {
-    float shadow;
+    float shadow = 0.0;
     float swidth = 1.5;  // shadow spread
     vec2 offset = mod(floor(gl_FragCoord.xy), 2.0) * swidth;
     shadow += lookup(-1.5 * swidth + offset.x, 1.5 * swidth - offset.y);
@@ -42,7 +49,7 @@ float getSoftShadowX4() {
 
 
 float getSoftShadowX16() {
-    float shadow;
+    float shadow = 0.0;
     float swidth = 1.0;
     float endp = swidth * 1.5;
     for (float y = -endp; y <= endp; y += swidth) {
@@ -55,7 +62,7 @@ float getSoftShadowX16() {
 
 
 float getSoftShadowX64() {
-    float shadow;
+    float shadow = 0.0;
     float swidth = 0.6;
     float endp = swidth * 3.0 + swidth / 2.0;
     for (float y = -endp; y <= endp; y += swidth) {
@@ -3,16 +3,29 @@
 layout (location = 0) in vec2 in_texcoord_0;
 layout (location = 1) in vec3 in_normal;
 layout (location = 2) in vec3 in_position;
+// per instance, from InstanceGroup
+layout (location = 3) in mat4 in_model;
 
 out vec2 uv_0;
 out vec3 normal;
 out vec3 fragPos;
 out vec4 shadowCoord;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
-uniform mat4 m_view_light;
-uniform mat4 m_model;
+struct Light {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+};
+
+// camera and light, written once a frame by ShaderProgram.write_frame
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_light;
+    vec3 camPos;
+    Light light;
+};
 
 mat4 m_shadow_bias = mat4(
     0.5, 0.0, 0.0, 0.0,
@@ -24,11 +37,11 @@ mat4 m_shadow_bias = mat4(
 
 void main() {
     uv_0 = in_texcoord_0;
-    fragPos = vec3(m_model * vec4(in_position, 1.0));
-    normal = mat3(transpose(inverse(m_model))) * normalize(in_normal);
-    gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
+    fragPos = vec3(in_model * vec4(in_position, 1.0));
+    normal = mat3(transpose(inverse(in_model))) * normalize(in_normal);
+    gl_Position = m_proj * m_view * in_model * vec4(in_position, 1.0);
 
-    mat4 shadowMVP = m_proj * m_view_light * m_model;
+    mat4 shadowMVP = m_proj * m_view_light * in_model;
     shadowCoord = m_shadow_bias * shadowMVP * vec4(in_position, 1.0);
     shadowCoord.z -= 0.0005;
 }
\ No newline at end of file
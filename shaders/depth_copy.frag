@@ -0,0 +1,9 @@
+#version 330 core
+
+uniform sampler2D u_depth;
+
+
+void main() {
+    // texel for texel, source and target have the same size
+    gl_FragDepth = texelFetch(u_depth, ivec2(gl_FragCoord.xy), 0).r;
+}
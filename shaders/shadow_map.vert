@@ -1,12 +1,26 @@
 #version 330 core
 
 layout (location = 2) in vec3 in_position;
+// per instance, from InstanceGroup
+layout (location = 3) in mat4 in_model;
 
-uniform mat4 m_proj;
-uniform mat4 m_view_light;
-uniform mat4 m_model;
+struct Light {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+};
+
+// camera and light, written once a frame by ShaderProgram.write_frame
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_light;
+    vec3 camPos;
+    Light light;
+};
 
 void main() {
-    mat4 mvp = m_proj * m_view_light * m_model;
+    mat4 mvp = m_proj * m_view_light * in_model;
     gl_Position = mvp * vec4(in_position, 1.0);
 }
\ No newline at end of file
@@ -3,12 +3,26 @@ layout (location = 0) in vec3 in_position;
 
 out vec3 texCubeCoords;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
+struct Light {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+};
+
+// camera and light, written once a frame by ShaderProgram.write_frame
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_light;
+    vec3 camPos;
+    Light light;
+};
 
 void main() {
     texCubeCoords = in_position;
-    vec4 pos = m_proj * m_view * vec4(in_position, 1.0);
+    // rotation only, the sky stays at infinity
+    vec4 pos = m_proj * mat4(mat3(m_view)) * vec4(in_position, 1.0);
     gl_Position = pos.xyww;
     gl_Position.z -= 0.0001;
 }
\ No newline at end of file